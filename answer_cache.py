@@ -0,0 +1,144 @@
+import os
+import re
+import time
+import logging
+import sqlite3
+from collections import OrderedDict
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "5000"))  # Entries kept in memory
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds, default 7 days
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "")  # SQLite file, empty keeps the cache in memory only
+ANSWER_CACHE_DISK_SIZE = int(os.getenv("ANSWER_CACHE_DISK_SIZE", "100000"))  # Rows kept on disk
+# Jaccard similarity a cached question needs for its answer to be reused for another, 0 disables reuse;
+# read here so the bot can skip the numpy-backed similarity index without importing it
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(text):
+    """Return the cache key for a question: case-folded with whitespace collapsed."""
+    return _WHITESPACE.sub(" ", str(text)).strip().casefold()
+
+
+class AnswerCache:
+    """LRU + TTL cache of answers keyed on normalized question text, optionally backed by SQLite."""
+
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, path=ANSWER_CACHE_PATH,
+                 disk_size=ANSWER_CACHE_DISK_SIZE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_size = disk_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (answer, stored_at)
+        self._writes = 0
+        self._db = None
+
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, question TEXT, answer TEXT, stored_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_stored_at ON answers (stored_at)")
+            self._prune_disk()
+            logging.info(f"Answer cache persisted to {path}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, stored_at):
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    def get(self, question):
+        """Return the cached answer for question, or None on a miss."""
+        key = normalize_question(question)
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            row = self._db.execute("SELECT answer, stored_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = row
+                self._remember(key, *entry)
+
+        if entry is None or self._expired(entry[1]):
+            if entry is not None:
+                self._forget(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, question, answer):
+        """Store the answer for question in memory and, if configured, on disk."""
+        key = normalize_question(question)
+        stored_at = time.time()
+        self._remember(key, answer, stored_at)
+
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, question, answer, stored_at) VALUES (?, ?, ?, ?)",
+                (key, question, answer, stored_at)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune_disk()
+
+    @property
+    def capacity(self):
+        """Number of answers the cache can hold, on disk when persisted."""
+        return self.disk_size if self._db is not None else self.max_size
+
+    def items(self):
+        """Yield (question, answer, stored_at) for every live entry, oldest first, from disk when persisted."""
+        if self._db is not None:
+            cutoff = time.time() - self.ttl if self.ttl > 0 else 0
+            yield from self._db.execute(
+                "SELECT question, answer, stored_at FROM answers WHERE stored_at >= ? ORDER BY stored_at", (cutoff,)
+            )
+        else:
+            for key, (answer, stored_at) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+                if not self._expired(stored_at):
+                    yield key, answer, stored_at
+
+    def _remember(self, key, answer, stored_at):
+        self._entries[key] = (answer, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+
+    def _prune_disk(self):
+        """Drop expired rows and keep at most disk_size of the newest ones."""
+        if self.ttl > 0:
+            self._db.execute("DELETE FROM answers WHERE stored_at < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM answers WHERE key IN ("
+            "SELECT key FROM answers ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_size,)
+        )
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._entries)
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,262 @@
+"""Library of vetted answers from completed RFP workbooks, consulted before the backend.
+
+Import workbooks (an 'rfp' sheet, or CSV, with 'question' and 'answer' columns) offline:
+
+    python answer_library.py import past_rfps/ more.xlsx --jobs 8
+    python answer_library.py lookup "Do you support SSO?"
+
+Imports are incremental: unchanged files are skipped and a question imported again gets its newest answer.
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import hashlib
+import logging
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import spreadsheet
+from answer_cache import normalize_question
+from job_store import DATA_DIR
+
+ANSWER_LIBRARY_DIR = os.getenv("ANSWER_LIBRARY_DIR", os.path.join(DATA_DIR, "answer_library"))
+ANSWER_LIBRARY_RELOAD = float(os.getenv("ANSWER_LIBRARY_RELOAD", "60"))  # Seconds between checks for a newer import
+
+INDEX_FILE = "questions.idx"  # Sorted question hashes, then the offset and length of each answer
+ANSWERS_FILE = "answers.dat"  # UTF-8 answers back to back, append-only
+MANIFEST_FILE = "manifest.json"  # Imported files and their size and mtime
+ENTRY_SIZE = 8 + 8 + 4
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm', '.csv')
+
+
+def question_hash(question):
+    """64-bit key of a question after normalization."""
+    digest = hashlib.blake2b(normalize_question(question).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _empty_index():
+    return np.zeros(0, dtype='<u8'), np.zeros(0, dtype='<u8'), np.zeros(0, dtype='<u4')
+
+
+def _read_index(path, memory_map):
+    """Return the (hashes, offsets, lengths) columns of an index file, each contiguous for fast search."""
+    count = os.path.getsize(path) // ENTRY_SIZE
+    if not count:
+        return _empty_index()
+    if memory_map:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+    return (
+        data[:count * 8].view('<u8'),
+        data[count * 8:count * 16].view('<u8'),
+        data[count * 16:count * 20].view('<u4')
+    )
+
+
+def _write_index(f, hashes, offsets, lengths):
+    for column in (hashes.astype('<u8'), offsets.astype('<u8'), lengths.astype('<u4')):
+        column.tofile(f)
+
+
+class AnswerLibrary:
+    """Read-only, memory-mapped view of the library; a newer import is picked up without a restart."""
+
+    def __init__(self, directory=ANSWER_LIBRARY_DIR, reload_interval=ANSWER_LIBRARY_RELOAD):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.hits = 0
+        self.lookups = 0
+        self._hashes, self._offsets, self._lengths = _empty_index()
+        self._answers = None
+        self._version = None
+        self._checked = 0.0
+        self._open()
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _open(self):
+        self._checked = time.monotonic()
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            stat = os.stat(index_path)
+        except FileNotFoundError:
+            return
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version == self._version:
+            return
+
+        # The index is replaced only after the answers it points to are on disk
+        columns = _read_index(index_path, memory_map=True)
+        answers = None
+        with open(os.path.join(self.directory, ANSWERS_FILE), 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                answers = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._hashes, self._offsets, self._lengths = columns
+        self._answers = answers
+        self._version = version
+        logging.info(f"Answer library loaded with {len(self)} answers from {self.directory}")
+
+    def get(self, question):
+        """Return the library answer for question, or None."""
+        if time.monotonic() - self._checked > self.reload_interval:
+            self._open()
+        if not len(self._hashes):
+            return None
+
+        self.lookups += 1
+        key = np.uint64(question_hash(question))
+        index = int(np.searchsorted(self._hashes, key))
+        if index == len(self._hashes) or self._hashes[index] != key:
+            return None
+        offset = int(self._offsets[index])
+        self.hits += 1
+        return self._answers[offset:offset + int(self._lengths[index])].decode('utf-8')
+
+    def stats(self):
+        return {'answers': len(self), 'lookups': self.lookups, 'hits': self.hits}
+
+
+def _read_workbook(path):
+    """Return ([(hash, answer bytes)], None) for one workbook, or (None, error); runs in an import worker."""
+    try:
+        return [
+            (question_hash(question), answer.encode('utf-8'))
+            for question, answer in spreadsheet.iter_answered(path, os.path.basename(path))
+        ], None
+    except Exception as e:
+        return None, str(e)
+
+
+def _workbooks(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith('~$'):
+                        yield os.path.abspath(os.path.join(root, name))
+        else:
+            yield os.path.abspath(path)
+
+
+def _replace(path, write):
+    """Write a file next to path and move it into place atomically."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def import_workbooks(paths, directory=ANSWER_LIBRARY_DIR, jobs=None, force=False):
+    """Add the answered rows of workbooks (files or directories) to the library and return an import report."""
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    pending = []
+    skipped = 0
+    for path in sorted(set(_workbooks(paths))):
+        stat = os.stat(path)
+        if not force and manifest.get(path) == [stat.st_size, stat.st_mtime_ns]:
+            skipped += 1
+        else:
+            pending.append((path, [stat.st_size, stat.st_mtime_ns]))
+
+    hashes, offsets, lengths = array('Q'), array('Q'), array('I')
+    failed = []
+    rows = 0
+    answers_path = os.path.join(directory, ANSWERS_FILE)
+    with open(answers_path, 'ab') as blob, ProcessPoolExecutor(max_workers=jobs) as pool:
+        offset = blob.tell()
+        # map keeps input order, so of two new files the later one wins for a shared question
+        results = pool.map(_read_workbook, [path for path, _ in pending], chunksize=1)
+        for (path, signature), (pairs, error) in zip(pending, results):
+            if error is not None:
+                logging.error(f"Skipped {path}: {error}")
+                failed.append(path)
+                continue
+            for key, answer in pairs:
+                blob.write(answer)
+                hashes.append(key)
+                offsets.append(offset)
+                lengths.append(len(answer))
+                offset += len(answer)
+            rows += len(pairs)
+            manifest[path] = signature
+        blob.flush()
+        os.fsync(blob.fileno())
+
+    # Merge with the existing index; for a repeated question the newest answer wins
+    index_path = os.path.join(directory, INDEX_FILE)
+    existing = _read_index(index_path, memory_map=False) if os.path.exists(index_path) else _empty_index()
+    added = (
+        np.frombuffer(hashes, dtype=np.uint64),
+        np.frombuffer(offsets, dtype=np.uint64),
+        np.frombuffer(lengths, dtype=np.uint32)
+    )
+    merged = [np.concatenate([old, new]) for old, new in zip(existing, added)]
+    order = np.argsort(merged[0], kind='stable')
+    merged = [column[order] for column in merged]
+    if len(order):
+        last = np.append(merged[0][1:] != merged[0][:-1], True)
+        merged = [column[last] for column in merged]
+    _replace(index_path, lambda f: _write_index(f, *merged))
+    _replace(manifest_path, lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+
+    seconds = time.perf_counter() - started
+    return {
+        'files': len(pending) - len(failed),
+        'skipped': skipped,
+        'failed': failed,
+        'rows': rows,
+        'answers': len(merged[0]),
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else 0.0,
+        'index_bytes': os.path.getsize(index_path),
+        'answers_bytes': os.path.getsize(answers_path)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--library", default=ANSWER_LIBRARY_DIR, help="library directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="import completed workbooks or directories of them")
+    importer.add_argument("paths", nargs="+")
+    importer.add_argument("--jobs", type=int, default=None, help="parallel readers, default one per CPU")
+    importer.add_argument("--force", action="store_true", help="re-read files imported before")
+    lookup = commands.add_parser("lookup", help="print the library answer for a question")
+    lookup.add_argument("question")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.command == "import":
+        report = import_workbooks(args.paths, args.library, args.jobs, args.force)
+        logging.info(
+            f"Imported {report['rows']} rows from {report['files']} files in {report['seconds']:.1f}s "
+            f"({report['rows_per_second']:.0f} rows/s), {report['skipped']} unchanged files skipped; "
+            f"library holds {report['answers']} answers"
+        )
+        print(json.dumps(report, indent=2))
+        return 1 if report['failed'] else 0
+
+    answer = AnswerLibrary(args.library).get(args.question)
+    print(answer if answer is not None else "No answer in the library")
+    return 0 if answer is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+
+import metrics
+from backpressure import (
+    API_MAX_RETRIES, API_AIMD_MAX, AIMDLimiter, CircuitBreaker, CircuitOpenError, backoff_delay, parse_retry_after
+)
+
+# Connection pool settings for the RFP backend
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "100"))  # Total open connections
+API_POOL_PER_HOST = int(os.getenv("API_POOL_PER_HOST", "20"))  # Open connections per host
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "300"))  # Total seconds per text request
+API_EXCEL_TIMEOUT = float(os.getenv("API_EXCEL_TIMEOUT", "0"))  # Total seconds per spreadsheet upload, 0 for no limit
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "10"))
+API_BATCH_PATH = os.getenv("API_BATCH_PATH", "/api/v1/questions/batch")
+API_SPOOL_SIZE = int(os.getenv("API_SPOOL_SIZE", str(1024 * 1024)))  # Bytes of a result file held in memory before spilling to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Statuses worth retrying; anything else is the backend rejecting the request
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RFPApiError(Exception):
+    """Raised when the RFP backend answers with a non-200 status."""
+
+    def __init__(self, status, text="", retry_after=None):
+        super().__init__(f"Error: {status}")
+        self.status = status
+        self.text = text
+        self.retry_after = retry_after  # Seconds the backend asked to wait with a 429 or 503
+
+
+def unprocessed(error):
+    """True when a failed call surely never reached the backend, so resending a non-idempotent request is safe.
+
+    A 502/504 or a dropped connection may end a run the backend carries on with; a 429/503 with
+    Retry-After or a connection that could not be opened means the request was turned away.
+    """
+    from aiohttp import ClientConnectorError
+    if isinstance(error, RFPApiError):
+        return error.status in (429, 503) and error.retry_after is not None
+    return isinstance(error, (ClientConnectorError, CircuitOpenError))
+
+
+class RFPApiClient:
+    """Async client for the RFP backend sharing one pooled connection set."""
+
+    def __init__(self, base_url, token, pool_size=API_POOL_SIZE, pool_per_host=API_POOL_PER_HOST,
+                 timeout=API_TIMEOUT, connect_timeout=API_CONNECT_TIMEOUT, max_retries=API_MAX_RETRIES,
+                 excel_timeout=API_EXCEL_TIMEOUT):
+        """Store settings; the session is created lazily inside the running loop."""
+        self.base_url = base_url
+        self.token = token
+        self.pool_size = pool_size
+        self.pool_per_host = pool_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.excel_timeout = excel_timeout
+        self.max_retries = max_retries
+
+        # Backpressure: stop calling an unhealthy backend and adapt concurrency to how it copes.
+        # Each endpoint has its own limit and latency baseline, a spreadsheet takes minutes where a question takes seconds
+        self.breaker = CircuitBreaker()
+        self.limiters = {
+            endpoint: AIMDLimiter(initial=min(pool_per_host, API_AIMD_MAX), maximum=API_AIMD_MAX)
+            for endpoint in ("text", "batch", "excel")
+        }
+        self.encoding = None  # "json" or "form" once the backend has accepted one
+
+        # API Endpoints
+        self.ai_url = f"{self.base_url}/api/v1/questions/text"
+        self.excel_url = f"{self.base_url}/api/v1/questions/excel"
+        self.batch_url = f"{self.base_url}{API_BATCH_PATH}"
+        self.batch_supported = True  # Cleared once the backend turns out to have no batch endpoint
+
+        self._session = None
+
+    @property
+    def session(self):
+        """Return the shared session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            # aiohttp is imported with the first request to keep it off the startup path
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_per_host)
+            timeout = aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            logging.info(
+                f"API session created (pool={self.pool_size}, per_host={self.pool_per_host}, "
+                f"timeout={self.timeout}s)"
+            )
+        return self._session
+
+    def _headers(self, accept):
+        return {
+            "Authorization": f"Bearer {self.token}",
+            "accept": accept
+        }
+
+    def capacity(self, endpoint):
+        """Return the calls the AIMD limit currently allows in flight to endpoint."""
+        return int(self.limiters[endpoint].limit)
+
+    async def _post(self, endpoint, url, accept, body, read, timeout=None, idempotent=True):
+        """POST with retries, jittered backoff, Retry-After, the circuit breaker and AIMD feedback.
+
+        body is called for every attempt so streamed uploads can be rewound. timeout replaces the
+        session's aiohttp.ClientTimeout. A request that is not idempotent is only sent again when the
+        backend surely did not start on it, see unprocessed().
+        """
+        from aiohttp import ClientError
+        options = {"timeout": timeout} if timeout is not None else {}
+        limiter = self.limiters[endpoint]
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            retry_after = None
+            with limiter:
+                started = time.monotonic()
+                with metrics.stage("backend_call", endpoint=endpoint):
+                    try:
+                        async with self.session.post(url, headers=self._headers(accept), **body(), **options) as response:
+                            metrics.BACKEND_REQUESTS.inc(endpoint=endpoint, outcome=response.status)
+                            if response.status == 200:
+                                result = await read(response)
+                                limiter.record(time.monotonic() - started, ok=True)
+                                self.breaker.record_success()
+                                return result
+
+                            if response.status in (429, 503):
+                                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                            error = RFPApiError(response.status, await response.text(), retry_after)
+                            if response.status not in RETRYABLE_STATUSES:
+                                # The backend is healthy, it just rejected this request
+                                limiter.record(time.monotonic() - started, ok=True)
+                                self.breaker.record_success()
+                                raise error
+                    except (ClientError, asyncio.TimeoutError) as e:
+                        metrics.BACKEND_REQUESTS.inc(endpoint=endpoint, outcome=type(e).__name__)
+                        error = e
+
+                limiter.record(time.monotonic() - started, ok=False)
+                self.breaker.record_failure()
+
+            if attempt == self.max_retries or not (idempotent or unprocessed(error)):
+                raise error
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            logging.warning(f"Backend call failed ({error!r}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def ask(self, question):
+        """Send one question to the text endpoint and return the answer."""
+        async def read_answer(response):
+            data = await response.json(content_type=None)
+            return data.get("answer", "I didn't understand that.")
+
+        if self.encoding != "form":
+            try:
+                answer = await self._post(
+                    "text", self.ai_url, "application/json", lambda: {"json": {"question": question}}, read_answer
+                )
+                self.encoding = "json"
+                return answer
+            except RFPApiError as e:
+                if e.status != 422 or self.encoding == "json":
+                    raise
+                logging.info("Backend rejected JSON questions, switching to form data")
+
+        # Backend only accepts form data, remember it so JSON is not probed again
+        answer = await self._post(
+            "text", self.ai_url, "application/json", lambda: {"data": {"question": question}}, read_answer
+        )
+        self.encoding = "form"
+        return answer
+
+    async def ask_batch(self, questions):
+        """Answer several questions in one round trip, falling back to one call each without a batch endpoint.
+
+        Returns one entry per question: the answer, or the exception raised for it.
+        """
+        if self.batch_supported:
+            async def read_answers(response):
+                data = await response.json(content_type=None)
+                return data.get("answers", [])
+
+            try:
+                answers = await self._post(
+                    "batch", self.batch_url, "application/json",
+                    lambda: {"json": {"questions": list(questions)}}, read_answers
+                )
+                if len(answers) == len(questions):
+                    return [answer if answer is not None else "I didn't understand that." for answer in answers]
+                logging.error(f"Batch endpoint returned {len(answers)} answers for {len(questions)} questions")
+            except RFPApiError as e:
+                if e.status not in (404, 405, 422):
+                    raise
+                self.batch_supported = False
+                logging.info(f"Backend has no batch endpoint ({e.status}), asking questions one by one")
+
+        return await asyncio.gather(*(self.ask(question) for question in questions), return_exceptions=True)
+
+    async def process_excel(self, source, filename):
+        """Upload a workbook (bytes, or a path streamed from disk) to the excel endpoint.
+
+        Returns the processed workbook as a file object positioned at the start; the caller closes it.
+        """
+        opened = []
+
+        def body():
+            # Reopen the file for every attempt, aiohttp closes it once uploaded
+            file = source
+            if isinstance(source, (str, os.PathLike)):
+                file = open(source, 'rb')
+                opened.append(file)
+            from aiohttp import FormData
+            form = FormData()
+            form.add_field("file", file, filename=filename, content_type=XLSX_MIME)
+            return {"data": form}
+
+        async def read_file(response):
+            # Stream the result to a spooled file so a large workbook never sits in memory whole
+            spool = tempfile.SpooledTemporaryFile(max_size=API_SPOOL_SIZE)
+            try:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    spool.write(chunk)
+            except BaseException:
+                spool.close()
+                raise
+            spool.seek(0)
+            return spool
+
+        from aiohttp import ClientTimeout
+        # A whole workbook can take the backend far longer than one question
+        timeout = ClientTimeout(total=self.excel_timeout or None, connect=self.connect_timeout)
+        try:
+            return await self._post("excel", self.excel_url, XLSX_MIME, body, read_file,
+                                    timeout=timeout, idempotent=False)
+        finally:
+            for file in opened:
+                file.close()
+
+    def stats(self):
+        return {
+            'breaker': self.breaker.state,
+            'concurrency_limit': sum(int(limiter.limit) for limiter in self.limiters.values()),
+            'in_flight': sum(limiter.in_flight for limiter in self.limiters.values()),
+            'limits': {endpoint: int(limiter.limit) for endpoint, limiter in self.limiters.items()},
+            'encoding': self.encoding or 'unknown'
+        }
+
+    async def close(self):
+        """Close the shared session and its connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -1,7 +1,10 @@
-from fastapi import FastAPI
+import startup  # First, so startup timings include every import  # noqa: F401
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 import logging
 
-from bot_telegram import init_bot
+import metrics
+from bot_telegram import init_bot, WEBHOOK_URL, WEBHOOK_PATH
 
 app = FastAPI()
 bot = None
@@ -11,7 +14,9 @@ async def startup_event():
     """Start the Telegram bot when the FastAPI application starts."""
     global bot
     bot = init_bot()
-    await bot.run()
+    # Receive updates on this server when a public URL is configured, otherwise poll
+    webhook_url = f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}" if WEBHOOK_URL else None
+    await bot.run(webhook_url=webhook_url)
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -24,3 +29,32 @@ async def shutdown_event():
 @app.get("/")
 def greet_json():
     return {"The bot is running": "True"}
+
+@app.get("/health")
+async def health():
+    """Report event-loop lag, stalls and executor backlogs measured by the bot's watchdog."""
+    if bot is None:
+        raise HTTPException(status_code=503, detail="Bot is not running")
+    stats = bot.watchdog.stats()
+    return {"ok": not stats['blocked'], **stats}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Expose stage timings, cache and queue gauges in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def telegram_webhook(request: Request):
+    """Receive a Telegram update and hand it to the bot."""
+    if bot is None:
+        raise HTTPException(status_code=503, detail="Bot is not running")
+    accepted = await bot.process_webhook_update(
+        await request.json(),
+        request.headers.get("X-Telegram-Bot-Api-Secret-Token")
+    )
+    if not accepted:
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    return {"ok": True}
+
+if WEBHOOK_URL:
+    # Polling bots must not accept updates over HTTP
+    app.add_api_route(WEBHOOK_PATH, telegram_webhook, methods=["POST"])
@@ -0,0 +1,257 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+import metrics
+from api_client import RFPApiError, RETRYABLE_STATUSES, unprocessed
+from backpressure import CircuitOpenError
+
+BASE_URLS = [url.strip() for url in os.getenv("BASE_URLS", "").split(",") if url.strip()]  # Several RFP backends, overrides BASE_URL
+ROUTER_HEALTH_PATH = os.getenv("ROUTER_HEALTH_PATH", "/health")  # Any answer below 500 counts as healthy
+ROUTER_HEALTH_INTERVAL = float(os.getenv("ROUTER_HEALTH_INTERVAL", "10"))  # Seconds between health checks
+ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "").lower() in ("1", "true", "yes")  # Re-ask slow text questions on a second backend
+ROUTER_HEDGE_MIN_SAMPLES = int(os.getenv("ROUTER_HEDGE_MIN_SAMPLES", "20"))  # Text answers seen before the p95 is trusted
+ROUTER_LATENCY_WINDOW = 500  # Recent text answers the hedging p95 is taken from
+ROUTER_EWMA_ALPHA = 0.3
+
+BACKENDS = metrics.Gauge("rfp_backends", "Latency estimate, calls in flight and health of each routed backend")
+HEDGED_REQUESTS = metrics.Counter("rfp_hedged_requests_total", "Duplicate text requests sent to a second backend and won by it")
+
+
+class Backend:
+    """One RFP server behind the router, with its latency estimate and health."""
+
+    def __init__(self, client):
+        self.client = client
+        self.url = client.base_url
+        self.healthy = True
+        self.outstanding = 0  # Calls in flight through the router
+        self.latency = None  # EWMA of seconds per call, None until the first answer
+        self.calls = 0
+        self.failures = 0
+
+    @property
+    def available(self):
+        return self.healthy and self.client.breaker.state != 'open'
+
+    def cost(self):
+        """Expected wait for one more call: the latency estimate times the calls it would queue behind."""
+        # Backends without an answer yet cost nothing so each gets measured, ties go to the least loaded
+        return (self.latency or 0.0) * (self.outstanding + 1), self.outstanding
+
+    def record(self, seconds):
+        self.latency = seconds if self.latency is None else (
+            (1 - ROUTER_EWMA_ALPHA) * self.latency + ROUTER_EWMA_ALPHA * seconds
+        )
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'breaker': self.client.breaker.state,
+            'latency': self.latency,
+            'outstanding': self.outstanding,
+            'calls': self.calls,
+            'failures': self.failures
+        }
+
+
+def _failed_over(error):
+    """True when error means the backend is down or overloaded, so another one may still answer."""
+    from aiohttp import ClientError
+    if isinstance(error, RFPApiError):
+        return error.status in RETRYABLE_STATUSES
+    return isinstance(error, (CircuitOpenError, ClientError, asyncio.TimeoutError))
+
+
+class BackendRouter:
+    """Spreads backend calls over several RFP servers, with the interface of one RFPApiClient.
+
+    Each call goes to the available server with the lowest latency estimate times calls in flight,
+    and moves on to the next one when a server is down. Servers are health-checked in the background.
+    With hedging on, a text question still unanswered after the observed p95 is also sent to a
+    second server; the first answer wins and the other request is cancelled.
+    """
+
+    def __init__(self, clients, hedge=ROUTER_HEDGE, health_path=ROUTER_HEALTH_PATH,
+                 health_interval=ROUTER_HEALTH_INTERVAL):
+        self.backends = [Backend(client) for client in clients]
+        self.hedge = hedge
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.latencies = deque(maxlen=ROUTER_LATENCY_WINDOW)  # Seconds per answered text question
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._health_task = None
+        BACKENDS.callback = self._gauges
+
+    def pick(self, exclude=()):
+        """Return the cheapest backend not in exclude, preferring available ones, or None."""
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        available = [backend for backend in candidates if backend.available] or candidates
+        return min(available, key=Backend.cost, default=None)
+
+    @property
+    def batch_supported(self):
+        return all(backend.client.batch_supported for backend in self.backends)
+
+    def capacity(self, endpoint):
+        """Return the calls the AIMD limits of the available backends allow in flight to endpoint."""
+        return sum(backend.client.capacity(endpoint) for backend in self.backends if backend.available)
+
+    def hedge_delay(self):
+        """Return the p95 text answer time, or None while too few answers were seen to hedge."""
+        if not self.hedge or len(self.backends) < 2 or len(self.latencies) < ROUTER_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def _call(self, backend, method, *args):
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._check_health())
+        backend.outstanding += 1
+        backend.calls += 1
+        started = time.monotonic()
+        try:
+            result = await getattr(backend.client, method)(*args)
+        except asyncio.CancelledError:
+            # The other request of a hedged pair answered first, this says nothing about the server
+            raise
+        except Exception as e:
+            if _failed_over(e):
+                # Errors come back fast and would make the server look cheap, skip it until a health check passes
+                backend.failures += 1
+                backend.healthy = False
+            else:
+                backend.record(time.monotonic() - started)
+            raise
+        finally:
+            backend.outstanding -= 1
+        seconds = time.monotonic() - started
+        backend.record(seconds)
+        backend.healthy = True
+        if method == 'ask':
+            self.latencies.append(seconds)
+        return result
+
+    async def _route(self, method, *args, idempotent=True):
+        """Call method on the best backend, moving on to the next one while backends are down.
+
+        A call that is not idempotent only moves on when the failed backend surely never started on it.
+        """
+        tried = []
+        while True:
+            backend = self.pick(exclude=tried)
+            tried.append(backend)
+            try:
+                return await self._call(backend, method, *args)
+            except Exception as e:
+                if not _failed_over(e) or len(tried) == len(self.backends) or not (idempotent or unprocessed(e)):
+                    raise
+                logging.warning(f"Backend {backend.url} failed ({e!r}), trying another")
+
+    async def ask(self, question):
+        """Answer one question, hedging on a second backend once it takes longer than the p95."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._route('ask', question)
+
+        tried = []
+        pending = set()
+
+        def launch():
+            backend = self.pick(exclude=tried)
+            if backend is None:
+                return None
+            tried.append(backend)
+            task = asyncio.create_task(self._call(backend, 'ask', question))
+            pending.add(task)
+            return task
+
+        first = launch()
+        hedged = False
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=None if hedged else delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if hedged and task is not first:
+                            self.hedge_wins += 1
+                            HEDGED_REQUESTS.inc(outcome="won")
+                        return task.result()
+                    error = task.exception()
+                    if not _failed_over(error):
+                        raise error
+                if not done and not hedged:
+                    # Slower than 95% of answers: ask another backend too
+                    hedged = True
+                    backend = self.pick(exclude=tried)
+                    if backend is not None and backend.available:
+                        self.hedges += 1
+                        HEDGED_REQUESTS.inc(outcome="sent")
+                        launch()
+                elif not pending:
+                    # Every request failed, fail over to the next backend
+                    launch()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ask_batch(self, questions):
+        return await self._route('ask_batch', questions)
+
+    async def process_excel(self, source, filename):
+        return await self._route('process_excel', source, filename, idempotent=False)
+
+    async def _check_health(self):
+        while True:
+            await asyncio.gather(*(self._probe(backend) for backend in self.backends))
+            await asyncio.sleep(self.health_interval)
+
+    async def _probe(self, backend):
+        from aiohttp import ClientError, ClientTimeout
+        try:
+            async with backend.client.session.get(
+                f"{backend.url}{self.health_path}", timeout=ClientTimeout(total=5)
+            ) as response:
+                healthy = response.status < 500
+        except (ClientError, asyncio.TimeoutError):
+            healthy = False
+        if healthy != backend.healthy:
+            logging.warning(f"Backend {backend.url} is {'healthy' if healthy else 'unhealthy'}")
+        backend.healthy = healthy
+
+    def stats(self):
+        states = {backend.client.breaker.state for backend in self.backends}
+        return {
+            'breaker': states.pop() if len(states) == 1 else 'mixed',
+            'concurrency_limit': sum(backend.client.stats()['concurrency_limit'] for backend in self.backends),
+            'in_flight': sum(backend.client.stats()['in_flight'] for backend in self.backends),
+            'encoding': self.backends[0].client.encoding or 'unknown',
+            'backends': [backend.stats() for backend in self.backends],
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hedge_delay': self.hedge_delay()
+        }
+
+    def _gauges(self):
+        # /metrics is public, label backends by their number as /status does instead of their internal URLs
+        values = {}
+        for number, backend in enumerate(self.backends, start=1):
+            label = ('backend', str(number))
+            values[(label, ('kind', 'latency'))] = backend.latency or 0.0
+            values[(label, ('kind', 'outstanding'))] = backend.outstanding
+            values[(label, ('kind', 'healthy'))] = int(backend.available)
+        return values
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        await asyncio.gather(*(backend.client.close() for backend in self.backends))
@@ -0,0 +1,119 @@
+import os
+import time
+import random
+import logging
+from email.utils import parsedate_to_datetime
+
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+API_BACKOFF_BASE = float(os.getenv("API_BACKOFF_BASE", "0.5"))  # Seconds before the first retry
+API_BACKOFF_MAX = float(os.getenv("API_BACKOFF_MAX", "30"))  # Longest backoff, also caps Retry-After
+API_BREAKER_FAILURES = int(os.getenv("API_BREAKER_FAILURES", "5"))  # Consecutive failures that open the circuit
+API_BREAKER_RESET = float(os.getenv("API_BREAKER_RESET", "30"))  # Seconds the circuit stays open
+API_AIMD_MIN = int(os.getenv("API_AIMD_MIN", "1"))
+API_AIMD_MAX = int(os.getenv("API_AIMD_MAX", "20"))
+API_AIMD_LATENCY_TOLERANCE = float(os.getenv("API_AIMD_LATENCY_TOLERANCE", "2.0"))  # x baseline counts as overload
+
+
+def backoff_delay(attempt, base=API_BACKOFF_BASE, cap=API_BACKOFF_MAX):
+    """Full-jitter exponential backoff for the given zero-based retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value, cap=API_BACKOFF_MAX):
+    """Return the delay in seconds requested by a Retry-After header, or None."""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), cap)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"Backend is temporarily unavailable, please try again in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets calls probe the backend once the reset timeout passes."""
+
+    def __init__(self, failure_threshold=API_BREAKER_FAILURES, reset_timeout=API_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def check(self):
+        """Raise CircuitOpenError if calls are currently rejected."""
+        if self.state == 'open':
+            raise CircuitOpenError(self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logging.info("Backend recovered, closing circuit breaker")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half-open' or (self.opened_at is None and self.failures >= self.failure_threshold):
+            logging.warning(f"Backend unhealthy after {self.failures} failures, opening circuit breaker")
+            self.opened_at = time.monotonic()
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows additively on healthy calls and halves on errors or latency spikes.
+
+    It does not hold calls back itself; the scheduler reads limit as its capacity so waiting calls stay
+    in its priority order.
+    """
+
+    def __init__(self, initial=API_AIMD_MAX, minimum=API_AIMD_MIN, maximum=API_AIMD_MAX,
+                 latency_tolerance=API_AIMD_LATENCY_TOLERANCE):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline = None  # Slow EWMA of healthy latency
+        self._last_decrease = 0.0
+
+    def __enter__(self):
+        self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.in_flight -= 1
+
+    def record(self, latency, ok):
+        """Adjust the limit from one completed call."""
+        overloaded = not ok or (
+            self.baseline is not None and latency > self.latency_tolerance * self.baseline
+        )
+        if ok:
+            self.baseline = latency if self.baseline is None else 0.95 * self.baseline + 0.05 * latency
+
+        if overloaded:
+            # Halve at most once per baseline interval so one burst of failures does not collapse the limit
+            now = time.monotonic()
+            if now - self._last_decrease >= (self.baseline or 1.0):
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+                logging.info(f"Backend overloaded, concurrency limit reduced to {int(self.limit)}")
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
@@ -0,0 +1,94 @@
+import os
+import asyncio
+import logging
+
+from scheduler import LANES
+
+API_BATCHING = os.getenv("API_BATCHING", "").lower() in ("1", "true", "yes")  # Group text questions per round trip
+BATCH_WINDOW = float(os.getenv("BATCH_WINDOW", "0.05"))  # Seconds to wait for more questions
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))  # Questions per backend call
+
+
+class MicroBatcher:
+    """Collects questions arriving within a short window and answers them with one ask_batch call.
+
+    backend is any adapter with an async ask_batch(questions) returning one answer (or exception) per question.
+    With a scheduler, questions are grouped before they queue and each batch takes one slot, in the most
+    urgent lane of its questions, so batches are not capped by the number of slots.
+    """
+
+    def __init__(self, backend, window=BATCH_WINDOW, max_size=BATCH_MAX_SIZE, scheduler=None):
+        self.backend = backend
+        self.window = window
+        self.max_size = max_size
+        self.scheduler = scheduler
+        self.batches = 0
+        self.questions = 0
+        self._pending = []  # (question, ticket, future)
+        self._timer = None
+        self._tasks = set()
+
+    async def ask(self, question, ticket=None):
+        """Queue question for the next batch and wait for its answer.
+
+        ticket is the scheduler Ticket of the caller, read when the batch is sent.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((question, ticket, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        # Callers cancelled while waiting for the window do not need an answer
+        batch = [(question, ticket, future) for question, ticket, future in batch if not future.done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.questions += len(batch)
+        questions = [question for question, _, _ in batch]
+        try:
+            tickets = [ticket for _, ticket, _ in batch if ticket is not None]
+            if self.scheduler is not None and tickets:
+                ticket = min(tickets, key=lambda ticket: LANES.index(ticket.lane))
+                answers = await self.scheduler.run(ticket.user_id, ticket.lane, self.backend.ask_batch, questions)
+            else:
+                answers = await self.backend.ask_batch(questions)
+        except Exception as e:
+            answers = [e] * len(batch)
+        if len(answers) != len(batch):
+            answers = [RuntimeError(f"Backend returned {len(answers)} answers for {len(batch)} questions")] * len(batch)
+
+        for (_, _, future), answer in zip(batch, answers):
+            if future.done():
+                continue
+            if isinstance(answer, BaseException):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'questions': self.questions,
+            'mean_size': self.questions / self.batches if self.batches else 0.0
+        }
+
+    async def close(self):
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logging.info(f"Micro-batcher sent {self.questions} questions in {self.batches} batches")
@@ -0,0 +1 @@
+"""Load tests that drive TelegramBot against a local stub backend; see benchmarks.run."""
@@ -0,0 +1,149 @@
+"""In-process stand-ins for the Telegram objects TelegramBot handlers touch, recording every reply."""
+import shutil
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+
+class Recorder:
+    """Collects what the bot sends and resolves a waiter once a request reaches its final message."""
+
+    def __init__(self):
+        self.messages = 0
+        self.documents = 0
+        self._waiters = {}  # chat_id -> (kind, future)
+
+    def expect(self, chat_id, kind):
+        """Return a future resolved with (ok, text) when the pending 'text' or 'excel' request of chat_id ends."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = (kind, future)
+        return future
+
+    def record(self, chat_id, action, text):
+        self.messages += action != 'document'
+        self.documents += action == 'document'
+        kind, future = self._waiters.get(chat_id, (None, None))
+        if future is None or future.done():
+            return
+
+        text = text or ""
+        if text.startswith("❌"):
+            ok = False
+        elif kind == 'excel' and action == 'document':
+            ok = True
+        elif kind == 'text' and action == 'edit' and text.startswith("✅"):
+            # The bot reports backend failures inside the answer text
+            ok = "\nError: " not in text and "\nConnection error" not in text and "unavailable" not in text
+        else:
+            return
+        del self._waiters[chat_id]
+        future.set_result((ok, text))
+
+
+class FakeMessage:
+    def __init__(self, recorder, chat_id, message_id, text=None, from_user=None, document=None):
+        self.recorder = recorder
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+        self.from_user = from_user
+        self.document = document
+
+    async def reply_text(self, text, **kwargs):
+        self.recorder.record(self.chat_id, 'reply', text)
+        return FakeMessage(self.recorder, self.chat_id, next(_message_ids), text)
+
+    async def reply_document(self, document, filename=None, caption=None, **kwargs):
+        document.read()
+        self.recorder.record(self.chat_id, 'document', caption)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        self.recorder.record(self.chat_id, 'edit', text)
+        return self
+
+    async def delete(self):
+        return True
+
+
+class FakeFile:
+    def __init__(self, source):
+        self.source = source
+
+    async def download_to_drive(self, path):
+        shutil.copyfile(self.source, path)
+        return path
+
+
+class FakeBot:
+    """The bot API calls TelegramBot makes; file IDs are local paths."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.recorder.record(chat_id, 'send', text)
+        return FakeMessage(self.recorder, chat_id, next(_message_ids), text)
+
+    async def send_document(self, chat_id, document, filename=None, caption=None, **kwargs):
+        if hasattr(document, 'read'):
+            document.read()
+        self.recorder.record(chat_id, 'document', caption)
+
+    async def get_file(self, file_id):
+        return FakeFile(file_id)
+
+
+class FakeApplication:
+    """Accepts the handlers TelegramBot registers without connecting to Telegram."""
+
+    updater = None
+
+    def __init__(self, recorder):
+        self.bot = FakeBot(recorder)
+        self.handlers = []
+        self.updates = []  # Updates handed to process_update, e.g. by the webhook route
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+
+    async def initialize(self):
+        pass
+
+    async def start(self):
+        pass
+
+    async def process_update(self, update):
+        self.updates.append(update)
+
+    async def stop(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def create_task(self, coroutine, update=None):
+        return asyncio.create_task(coroutine)
+
+
+_message_ids = itertools.count(1)
+
+
+def make_update(recorder, user_id, text=None, document_path=None, filename=None):
+    """Build an update as a private chat with user_id sends text or a document stored at document_path."""
+    document = None
+    if document_path:
+        document = SimpleNamespace(file_id=document_path, file_name=filename or document_path)
+    message = FakeMessage(
+        recorder, user_id, next(_message_ids), text=text,
+        from_user=SimpleNamespace(id=user_id), document=document
+    )
+    return SimpleNamespace(
+        message=message,
+        effective_chat=SimpleNamespace(id=user_id),
+        effective_user=message.from_user
+    )
+
+
+def make_context(application, args=()):
+    return SimpleNamespace(bot=application.bot, args=list(args))
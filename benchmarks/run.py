@@ -0,0 +1,268 @@
+"""Load-test scenarios driving TelegramBot handlers against the stub backend, reported as JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.run text --users 50 --requests 5
+    python -m benchmarks.run excel --spreadsheets 5 --rows 200 --excel-mode fanout
+    python -m benchmarks.run mixed --users 20 --spreadsheets 3 --output results.json
+    python -m benchmarks.run text --backends 3 --tail-rate 0.05 --hedge
+
+The stub backends run in their own processes so their CPU use does not count against the bot; with
+--backends above one the bot routes across them as it would across several BASE_URLS. The report
+holds throughput, latency percentiles, the event-loop lag seen by the bot and its peak RSS.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import shutil
+import resource
+import tempfile
+import subprocess
+import urllib.request
+
+from benchmarks import stub_backend
+from benchmarks.fake_telegram import Recorder, FakeApplication, make_update, make_context
+
+WORDS = (
+    "data retention encryption audit backup vendor support uptime region access policy incident "
+    "response training privacy export integration license pricing roadmap hosting latency sso mfa "
+    "key rotation logging monitoring escalation contract insurance subprocessor deletion residency"
+).split()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values, None when empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))]
+
+
+def summarize(latencies):
+    return {
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies) if latencies else None
+    }
+
+
+class QuestionSource:
+    """Random, mutually dissimilar questions; duplicate_ratio of them repeat earlier ones."""
+
+    def __init__(self, seed, duplicate_ratio=0.0):
+        self.random = random.Random(seed)
+        self.duplicate_ratio = duplicate_ratio
+        self.asked = []
+
+    def next(self):
+        if self.asked and self.random.random() < self.duplicate_ratio:
+            return self.random.choice(self.asked)
+        words = self.random.sample(WORDS, 6)
+        question = f"Q{len(self.asked)}: how do you handle {' '.join(words)}?"
+        self.asked.append(question)
+        return question
+
+
+class LoopLagProbe:
+    """Measures how late a short periodic sleep wakes up, i.e. how long other work blocks the loop."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def stop(self):
+        self._task.cancel()
+        return {key: value * 1000 if value is not None else None for key, value in summarize(self.samples).items()}
+
+
+def write_spreadsheet(path, questions):
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("rfp")
+    sheet.append(["Question", "Answer"])
+    for question in questions:
+        sheet.append([question, None])
+    workbook.save(path)
+
+
+async def run_scenario(args, base_url, work_dir):
+    import bot_telegram
+
+    recorder = Recorder()
+    application = FakeApplication(recorder)
+    bot = bot_telegram.TelegramBot("0:benchmark", base_url, application=application)
+    context = make_context(application)
+    await bot._load_similarity_index()
+    await bot._load_answer_library()
+    await bot.spreadsheet_pool.warm()
+
+    results = {'text': [], 'excel': []}  # (ok, seconds)
+    questions = QuestionSource(args.seed, args.duplicate_ratio)
+
+    async def request(kind, update, handler):
+        user_id = update.message.from_user.id
+        done = recorder.expect(user_id, kind)
+        started = time.perf_counter()
+        await handler(update, context)
+        try:
+            ok, _ = await asyncio.wait_for(done, args.timeout)
+        except asyncio.TimeoutError:
+            ok = False
+        results[kind].append((ok, time.perf_counter() - started))
+
+    async def text_user(user_id):
+        bot.authenticated_users.add(user_id)
+        for _ in range(args.requests):
+            update = make_update(recorder, user_id, text=questions.next())
+            await request('text', update, bot.handle_message)
+
+    async def excel_user(user_id, path):
+        bot.authenticated_users.add(user_id)
+        update = make_update(recorder, user_id, document_path=path, filename=os.path.basename(path))
+        await request('excel', update, bot.handle_excel)
+
+    users = []
+    if args.scenario in ("text", "mixed"):
+        users += [text_user(1000 + index) for index in range(args.users)]
+    if args.scenario in ("excel", "mixed"):
+        for index in range(args.spreadsheets):
+            path = os.path.join(work_dir, f"rfp_{index}.xlsx")
+            write_spreadsheet(path, [questions.next() for _ in range(args.rows)])
+            users.append(excel_user(5000 + index, path))
+
+    probe = LoopLagProbe()
+    probe.start()
+    started = time.perf_counter()
+    await asyncio.gather(*users)
+    elapsed = time.perf_counter() - started
+    loop_lag = probe.stop()
+    api_stats = bot.api_client.stats()
+    await bot.bot_stop()
+
+    report = {}
+    for kind, outcomes in results.items():
+        if not outcomes:
+            continue
+        latencies = [seconds for ok, seconds in outcomes if ok]
+        report[kind] = {
+            'requests': len(outcomes),
+            'failed': sum(not ok for ok, _ in outcomes),
+            'throughput_per_s': len(latencies) / elapsed,
+            'latency_s': summarize(latencies)
+        }
+        if kind == 'excel':
+            report[kind]['questions_per_s'] = len(latencies) * args.rows / elapsed
+    report['elapsed_s'] = elapsed
+    report['event_loop_lag_ms'] = loop_lag
+    report['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    report['telegram'] = {'messages': recorder.messages, 'documents': recorder.documents}
+    if 'backends' in api_stats:
+        report['router'] = {key: api_stats[key] for key in ('hedges', 'hedge_wins', 'hedge_delay')}
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(args, port, seed):
+    command = [
+        sys.executable, "-m", "benchmarks.stub_backend", "--port", str(port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+        "--accept", args.accept, "--excel-latency", str(args.excel_latency),
+        "--tail-rate", str(args.tail_rate), "--tail-latency", str(args.tail_latency), "--seed", str(seed)
+    ]
+    if args.no_batch:
+        command.append("--no-batch")
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Stub backend did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", choices=("text", "excel", "mixed"))
+    parser.add_argument("--users", type=int, default=20, help="concurrent text users")
+    parser.add_argument("--requests", type=int, default=5, help="questions each text user sends in turn")
+    parser.add_argument("--spreadsheets", type=int, default=3, help="spreadsheets uploaded at once")
+    parser.add_argument("--rows", type=int, default=200, help="questions per spreadsheet")
+    parser.add_argument("--excel-mode", choices=("bulk", "fanout"), default="bulk")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0, help="share of repeated questions")
+    parser.add_argument("--batching", action="store_true", help="enable API_BATCHING in the bot")
+    parser.add_argument("--backends", type=int, default=1, help="stub backends the bot routes across")
+    parser.add_argument("--hedge", action="store_true", help="enable ROUTER_HEDGE in the bot")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds before a request counts as failed")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    stub_backend.add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    work_dir = tempfile.mkdtemp(prefix="rfp_bench_")
+    base_urls = [f"http://127.0.0.1:{free_port()}" for _ in range(args.backends)]
+
+    # bot_telegram reads its settings at import time
+    os.environ.update({
+        'DATA_DIR': os.path.join(work_dir, "data"),
+        'EXCEL_PROCESSING_MODE': args.excel_mode,
+        'FILE_RFP_EXCEL_COUNT': str(max(args.rows, 200)),
+        'API_BATCHING': "1" if args.batching else "",
+        'ANSWER_CACHE_PATH': "",
+        'BASE_URLS': ",".join(base_urls),
+        'ROUTER_HEDGE': "1" if args.hedge else ""
+    })
+
+    stubs = []
+    try:
+        for index, base_url in enumerate(base_urls):
+            stubs.append(start_stub(args, int(base_url.rsplit(":", 1)[1]), args.seed + index))
+        report = asyncio.run(run_scenario(args, base_urls[0], work_dir))
+        backends = []
+        for base_url in base_urls:
+            with urllib.request.urlopen(f"{base_url}/stats", timeout=5) as response:
+                backends.append(json.load(response))
+        report['backend'] = {key: sum(stats[key] for stats in backends) for key in backends[0]}
+        if len(backends) > 1:
+            report['backends'] = dict(zip(base_urls, backends))
+    finally:
+        for stub in stubs:
+            stub.terminate()
+            stub.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {'scenario': args.scenario, 'config': vars(args), **report}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Local stand-in for the RFP backend with configurable latency, errors and request encoding.
+
+Run from the repository root:
+
+    python -m benchmarks.stub_backend --port 8765 --latency 0.5 --error-rate 0.02 --accept form
+    python -m benchmarks.stub_backend --port 8766 --tail-rate 0.05 --tail-latency 5
+"""
+import os
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+from aiohttp import web
+
+import spreadsheet
+
+
+class StubBackend:
+    """aiohttp app implementing the text, batch and excel endpoints of the RFP backend."""
+
+    def __init__(self, latency=0.2, jitter=0.1, error_rate=0.0, accept="json", batch=True,
+                 excel_latency=0.05, tail_rate=0.0, tail_latency=5.0, seed=0):
+        self.latency = latency  # Seconds per text answer
+        self.jitter = jitter  # Relative +- spread of the latency
+        self.error_rate = error_rate  # Share of requests answered with a 503
+        self.accept = accept  # "json", "form" or "both"; the other encoding gets a 422
+        self.batch = batch  # Serve the batch endpoint, otherwise 404
+        self.excel_latency = excel_latency  # Seconds per spreadsheet row
+        self.tail_rate = tail_rate  # Share of text answers taking tail_latency instead
+        self.tail_latency = tail_latency
+        self.random = random.Random(seed)
+        self.requests = {'text': 0, 'batch': 0, 'excel': 0, 'errors': 0, 'rejected': 0}
+
+    def app(self):
+        app = web.Application(client_max_size=100 * 1024 * 1024)
+        app.router.add_post('/api/v1/questions/text', self.text)
+        app.router.add_post('/api/v1/questions/batch', self.batch_text)
+        app.router.add_post('/api/v1/questions/excel', self.excel)
+        app.router.add_get('/stats', self.stats)
+        app.router.add_get('/health', self.health)
+        return app
+
+    async def _delay(self, seconds):
+        await asyncio.sleep(max(0.0, seconds * (1 + self.random.uniform(-self.jitter, self.jitter))))
+
+    def _fail(self):
+        if self.random.random() < self.error_rate:
+            self.requests['errors'] += 1
+            return web.Response(status=503, text="stub: injected failure")
+        return None
+
+    async def text(self, request):
+        self.requests['text'] += 1
+        is_json = request.content_type == 'application/json'
+        if (self.accept == "json" and not is_json) or (self.accept == "form" and is_json):
+            self.requests['rejected'] += 1
+            return web.json_response({"detail": "unsupported encoding"}, status=422)
+        data = await request.json() if is_json else await request.post()
+        slow = self.random.random() < self.tail_rate
+        await self._delay(self.tail_latency if slow else self.latency)
+        failure = self._fail()
+        if failure is not None:
+            return failure
+        return web.json_response({"answer": f"Stub answer to: {data.get('question', '')}"})
+
+    async def batch_text(self, request):
+        if not self.batch:
+            return web.Response(status=404)
+        self.requests['batch'] += 1
+        questions = (await request.json()).get("questions", [])
+        await self._delay(self.latency)
+        failure = self._fail()
+        if failure is not None:
+            return failure
+        return web.json_response({"answers": [f"Stub answer to: {q}" for q in questions]})
+
+    async def excel(self, request):
+        self.requests['excel'] += 1
+        field = (await request.post())["file"]
+        suffix = os.path.splitext(field.filename)[1]
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(field.file.read())
+        try:
+            questions = await asyncio.to_thread(spreadsheet.scan_questions, path, field.filename, 10 ** 6)
+            await self._delay(self.excel_latency * sum(q is not None for q in questions))
+            failure = self._fail()
+            if failure is not None:
+                return failure
+            answers = [f"Stub answer to: {q}" if q else None for q in questions]
+            body = await asyncio.to_thread(spreadsheet.write_answers, path, field.filename, answers)
+            return web.Response(body=body, content_type=spreadsheet_mime(field.filename))
+        finally:
+            spreadsheet.remove_file(path)
+
+    async def stats(self, request):
+        return web.json_response(self.requests)
+
+    async def health(self, request):
+        return web.json_response({"ok": True})
+
+
+def spreadsheet_mime(filename):
+    if spreadsheet.is_csv(filename):
+        return "text/csv"
+    return "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per text answer")
+    parser.add_argument("--jitter", type=float, default=0.1, help="relative latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503")
+    parser.add_argument("--accept", choices=("json", "form", "both"), default="json",
+                        help="question encoding accepted, the other one gets a 422")
+    parser.add_argument("--no-batch", action="store_true", help="answer the batch endpoint with 404")
+    parser.add_argument("--excel-latency", type=float, default=0.05, help="seconds per spreadsheet row")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of text answers that are slow")
+    parser.add_argument("--tail-latency", type=float, default=5.0, help="seconds per slow text answer")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(args):
+    return StubBackend(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, accept=args.accept,
+        batch=not args.no_batch, excel_latency=args.excel_latency, tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency, seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    web.run_app(from_arguments(args).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,34 @@
 import os
+import hmac
+import secrets
 import logging
-import requests
+import importlib
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext
-import aiohttp
-import io
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 import time
-import pandas as pd
+import math
+import tempfile
 from dotenv import load_dotenv
 
+import metrics
+import startup
+import spreadsheet
+from api_client import RFPApiClient, RFPApiError
+from backend_router import BackendRouter, BASE_URLS
+from batcher import MicroBatcher, API_BATCHING
+from backpressure import CircuitOpenError
+from answer_cache import AnswerCache, normalize_question, ANSWER_CACHE_PATH, SIMILARITY_THRESHOLD
+from job_store import JobStore, JobHandle, JOB_LEASE, JOB_CHECKPOINT_INTERVAL
+from state_backend import open_state, worker_id
+from scheduler import FairScheduler, Ticket, INTERACTIVE, PRIORITY, BULK, LANES
+from registry import RequestRegistry
+from singleflight import SingleFlight
+from watchdog import Watchdog
+from spreadsheet_pool import SpreadsheetPool, SPREADSHEET_PREWARM
+from progress import ProgressMessage, JobProgress, format_duration, PROGRESS_EDIT_INTERVAL
+from question_split import split_questions, join_answers, chunk_text
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -23,29 +41,43 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 BASE_URL = os.getenv("BASE_URL")
 HF_TOKEN = os.getenv("HF_TOKEN")
 FILE_RFP_EXCEL_COUNT = int(os.getenv("FILE_RFP_EXCEL_COUNT", "100"))  # Default to 100 if not set
+# "bulk" uploads the whole file to the excel endpoint, "fanout" asks each question via the text endpoint
+EXCEL_PROCESSING_MODE = os.getenv("EXCEL_PROCESSING_MODE", "bulk").lower()
+EXCEL_FANOUT_CONCURRENCY = int(os.getenv("EXCEL_FANOUT_CONCURRENCY", "10"))
+EXCEL_UPLOAD_CONCURRENCY = int(os.getenv("EXCEL_UPLOAD_CONCURRENCY", "4"))  # Whole files the backend processes at once in bulk mode
+# Public URL of the FastAPI app; when set, app.py receives updates by webhook instead of polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Required with several workers, otherwise generated at startup
+# "0" serves the webhook without registering it with Telegram, e.g. for a local harness POSTing updates; needs WEBHOOK_SECRET
+WEBHOOK_REGISTER = os.getenv("WEBHOOK_REGISTER", "1").lower() not in ("0", "false", "no")
+WORKER_MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", "0"))  # Spreadsheet jobs one worker runs at once, 0 for no limit
+JOB_CONTROL_INTERVAL = float(os.getenv("JOB_CONTROL_INTERVAL", "1"))  # Seconds between checks for /cancel and /priority sent to other workers
 # API_USERNAME = os.getenv("API_USERNAME")
 # API_PASSWORD = os.getenv("API_PASSWORD")
 
 # Set the secret password for authentication
 SECRET_PASSWORD = BOT_SECRET_PASSWORD
 
-# Dictionary to store authenticated users
-AUTHENTICATED_USERS = set()
-AWAITING_PASSWORD = set()
-
 logging.info("Bot starting... v0.1.0")  # Add version number
 
 # Add debug logging
 logging.info(f"BOT_TOKEN loaded: {'yes' if BOT_TOKEN else 'no'}")
 logging.info(f"BASE_URL loaded: {'yes' if BASE_URL else 'no'}")
+logging.info(f"BASE_URLS loaded: {len(BASE_URLS)} backends")
 logging.info(f"HF_TOKEN loaded: {'yes' if HF_TOKEN else 'no'}")
 logging.info(f"BOT_SECRET_PASSWORD loaded: {'yes' if BOT_SECRET_PASSWORD else 'no'}")
+logging.info(f"Excel processing mode: {EXCEL_PROCESSING_MODE}")
 
 class TelegramBot:
     """A Telegram bot with password-based authentication."""
 
-    def __init__(self, bot_token, base_url, application=None):
-        """Initialize the bot with Telegram API token, API credentials, and authentication."""
+    def __init__(self, bot_token, base_url, application=None, api_client=None):
+        """Initialize the bot with Telegram API token, API credentials, and authentication.
+
+        api_client replaces the HTTP backend adapter, e.g. with one pointed at a local stub.
+        With several BASE_URLS, calls are routed across all of them instead of going to base_url.
+        """
         self.bot_token = bot_token
         self.base_url = base_url
         # self.username = username
@@ -54,17 +86,64 @@ class TelegramBot:
 
         # API Endpoints
         self.login_url = f"{self.base_url}/api/v1/auth/login"
-        self.ai_url = f"{self.base_url}/api/v1/questions/text"
-        self.excel_url = f"{self.base_url}/api/v1/questions/excel"
 
-        # Executors
-        self.text_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="text_worker")
-        self.excel_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="excel_worker")
-        self.excel_semaphore = asyncio.Semaphore(10)
+        # Pooled async client for the RFP backend, or a router over several of them
+        if api_client is None and len(BASE_URLS) > 1:
+            api_client = BackendRouter([RFPApiClient(url, HF_TOKEN) for url in BASE_URLS])
+        self.api_client = api_client or RFPApiClient(BASE_URLS[0] if BASE_URLS else self.base_url, HF_TOKEN)
+
+        # Authenticated users, the request registry, answer cache and job queue live in this process,
+        # or with STATE_BACKEND=sqlite are shared by all workers on the host
+        self.state = open_state()
+        self.worker = worker_id()
+        self.authenticated_users = self.state.members('authenticated')
+        self.awaiting_password = self.state.members('awaiting_password')
+
+        # Answers keyed on normalized question text
+        self.answer_cache = AnswerCache(path=ANSWER_CACHE_PATH or (self.state.path if self.state.shared else ""))
+
+        # Near-duplicate lookup over previously answered questions, built once the bot is serving
+        self.similarity_index = None
+
+        # Vetted answers imported from past RFPs with answer_library.py, opened once the bot is serving
+        self.answer_library = None
+
+        # Identical questions asked at the same time share one backend call
+        self.in_flight = SingleFlight()
+
+        # Worker processes for parsing and writing spreadsheets
+        self.spreadsheet_pool = SpreadsheetPool()
+
+        # Durable spreadsheet jobs, claimed by whichever worker has room and resumed on startup
+        self.job_store = JobStore()
+        self.jobs = {}  # job_id -> JobHandle of the jobs this worker is running
+        self.job_loop = None
+
+        # Token Telegram sends with every webhook update, set once the webhook is registered
+        self.webhook_secret = None
+
+        # Feed live component state into the /metrics gauges
+        metrics.ANSWER_CACHE.callback = lambda: {
+            (('kind', kind),): self.answer_cache.stats()[kind] for kind in ('hits', 'misses', 'size')
+        }
+        metrics.QUEUE_DEPTH.callback = lambda: {
+            **{(('lane', lane),): self.scheduler.queued(lane) for lane in LANES},
+            (('lane', 'upload'),): self.upload_scheduler.queued()
+        }
+        metrics.BACKEND_SLOTS.callback = lambda: {
+            (('kind', 'scheduler_active'),): self.scheduler.active,
+            (('kind', 'scheduler_limit'),): self.scheduler.concurrency,
+            (('kind', 'upload_active'),): self.upload_scheduler.active,
+            (('kind', 'upload_limit'),): self.upload_scheduler.concurrency,
+            (('kind', 'backend_in_flight'),): self.api_client.stats()['in_flight'],
+            (('kind', 'backend_limit'),): self.api_client.stats()['concurrency_limit']
+        }
+        metrics.COALESCED.callback = lambda: {
+            (('kind', kind),): self.in_flight.stats()[kind] for kind in ('calls', 'collapsed', 'in_flight')
+        }
         
-        # Track active processes
-        self.active_requests = {}
-        self.active_excel_files = {}
+        # Track active processes; completed ones expire
+        self.requests = RequestRegistry(state=self.state if self.state.shared else None, worker=self.worker)
 
         # Start Telegram Bot
         if application:
@@ -77,13 +156,21 @@ class TelegramBot:
         logging.info("Authenticating with API...")
         # self.authenticate()
 
-        # Create a ThreadPoolExecutor for handling concurrent requests
-        self.executor = ThreadPoolExecutor(max_workers=10)
+        # Shares backend capacity fairly between users, text questions first; the slots follow the
+        # backend's AIMD limit so calls held back by an overloaded backend still queue by priority
+        self.scheduler = FairScheduler(capacity=lambda: self.api_client.capacity(self._text_endpoint()))
+        # Whole-file uploads keep the backend busy for minutes, they queue apart from the question slots
+        self.upload_scheduler = FairScheduler(
+            concurrency=EXCEL_UPLOAD_CONCURRENCY, reserved=0, capacity=lambda: self.api_client.capacity("excel")
+        )
 
-        # Increase Excel workers for more concurrent processing
-        self.excel_executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="excel_worker")
-        self.excel_semaphore = asyncio.Semaphore(10)  # Allow 10 concurrent Excel processes
-        self.active_excel_files = {}
+        # Text questions go out one per call, or grouped into micro-batches that take one slot each
+        self.batcher = MicroBatcher(self.api_client, scheduler=self.scheduler) if API_BATCHING else None
+
+        # Event-loop lag, stalls and executor backlogs, started with the bot
+        self.watchdog = Watchdog()
+        self.watchdog.watch_executor("spreadsheet_pool", self.spreadsheet_pool.queued)
+        startup.mark("bot_init")
 
     # def authenticate(self):
     #     """Authenticate with the API and retrieve an access token."""
@@ -106,17 +193,20 @@ class TelegramBot:
         """Handles the /start command and asks for a password if the user is not authenticated."""
         user_id = update.message.from_user.id
 
-        if user_id in AUTHENTICATED_USERS:
+        if user_id in self.authenticated_users:
             await update.message.reply_text(
                 "✅ You are already authenticated!\n\n"
                 "You can :\n"
                 "1. Send me any question as text\n"
                 "2. Send me an Excel file with questions (must have a 'question' column in 'rfp' sheet)\n\n"
                 "Note: Excel files must contain no more than 200 questions.\n\n"
-                "type '/status' to check the status of the request"
+                "type '/status' to check the status of the request\n"
+                "type '/partial <id>' to download the answers of a running Excel job so far\n"
+                "type '/cancel <id>' to stop an Excel job and get the answers so far\n"
+                "type '/priority <id>' to move an Excel job ahead of your other files"
             )
         else:
-            AWAITING_PASSWORD.add(user_id)
+            self.awaiting_password.add(user_id)
             await update.message.reply_text("🔑 Please enter the secret password to access the bot.")
 
     async def handle_message(self, update: Update, context: CallbackContext):
@@ -126,12 +216,12 @@ class TelegramBot:
         message_id = update.message.message_id
 
         # If user is waiting to enter a password, validate it
-        if user_id in AWAITING_PASSWORD:
+        if user_id in self.awaiting_password:
             await self.check_password(update, context)
             return
 
         # If user is authenticated, process AI request
-        if user_id in AUTHENTICATED_USERS:
+        if user_id in self.authenticated_users:
             # Create task for processing
             asyncio.create_task(self.chat_with_ai(update, context))
         else:
@@ -144,8 +234,8 @@ class TelegramBot:
         user_message = update.message.text.strip()
 
         if user_message == SECRET_PASSWORD:
-            AUTHENTICATED_USERS.add(user_id)
-            AWAITING_PASSWORD.discard(user_id)
+            self.authenticated_users.add(user_id)
+            self.awaiting_password.discard(user_id)
             logging.info(f"User {user_id} authenticated successfully.")
             await update.message.reply_text(
                 "✅ Authentication successful!\n\n"
@@ -160,73 +250,128 @@ class TelegramBot:
     async def chat_with_ai(self, update: Update, context: CallbackContext):
         """Process text messages asynchronously"""
         message_id = update.message.message_id
+        user_id = update.message.from_user.id
         user_message = update.message.text
+        metrics.TRACE_ID.set(message_id)
+        processing_msg = None
+        status = 'completed'
 
         try:
-            # Send immediate acknowledgment
-            processing_msg = await update.message.reply_text(
-                f"🤔 Processing your request...\n"
-                f"Request ID: #{message_id}"
-            )
+            questions = split_questions(user_message)
+
+            # Send immediate acknowledgment with the expected wait behind other users
+            position, wait = self.scheduler.estimate(user_id, INTERACTIVE)
+            queue_note = f"\nQueue position: {position} (~{wait:.0f}s wait)" if position else ""
+            list_note = f"\nQuestions found: {len(questions)}" if len(questions) > 1 else ""
+            with metrics.stage("reply"):
+                processing_msg = await update.message.reply_text(
+                    f"🤔 Processing your request...\n"
+                    f"Request ID: #{message_id}"
+                    f"{list_note}"
+                    f"{queue_note}"
+                )
 
             # Track this request
-            self.active_requests[message_id] = {
-                'type': 'text',
-                'status': 'processing',
-                'start_time': time.time()
-            }
-
-            # Process in thread pool
-            response = await asyncio.get_event_loop().run_in_executor(
-                self.text_executor,
-                self._make_api_request,
-                user_message
-            )
+            self.requests.start(user_id, message_id, 'text')
 
-            # Update with response
-            await processing_msg.edit_text(
-                f"✅ Response for #{message_id}:\n{response}"
-            )
+            if len(questions) > 1:
+                await self._answer_question_list(update, processing_msg, message_id, user_id, questions)
+                return
+
+            response = await self._make_api_request(user_message, user_id)
+
+            # Update with response, split to fit Telegram's message size limit
+            chunks = chunk_text(f"✅ Response for #{message_id}:\n{response}")
+            with metrics.stage("reply"):
+                await processing_msg.edit_text(chunks[0])
+                for chunk in chunks[1:]:
+                    await update.message.reply_text(chunk)
 
         except Exception as e:
             logging.error(f"Error processing text request: {e}")
-            await processing_msg.edit_text(
-                f"❌ Error processing request #{message_id}: {str(e)}"
-            )
+            status = 'failed'
+            if processing_msg:
+                await processing_msg.edit_text(
+                    f"❌ Error processing request #{message_id}: {str(e)}"
+                )
         finally:
-            if message_id in self.active_requests:
-                self.active_requests[message_id]['status'] = 'completed'
-                self.active_requests[message_id]['end_time'] = time.time()
+            self.requests.finish(user_id, message_id, status)
 
-    def _make_api_request(self, user_message):
-        """Make API request"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {HF_TOKEN}",
-                "accept": "application/json"
-            }
-
-            json_payload = {"question": user_message}
-            form_payload = {"question": user_message}
-
-            response = requests.post(
-                self.ai_url, 
-                headers={**headers, "Content-Type": "application/json"}, 
-                json=json_payload
-            )
+    async def _answer_question_list(self, update, processing_msg, message_id, user_id, questions):
+        """Answer the items of a pasted question list in parallel, replying to each as soon as it is ready"""
+        total = len(questions)
+        progress_msg = ProgressMessage(processing_msg)
 
-            if response.status_code == 422:
-                response = requests.post(
-                    self.ai_url, 
-                    headers={**headers, "Content-Type": "application/x-www-form-urlencoded"},
-                    data=form_payload
-                )
+        async def answer(index, question):
+            return index, question, await self._make_api_request(question, user_id)
 
-            if response.status_code == 200:
-                return response.json().get("answer", "I didn't understand that.")
-            else:
-                return f"Error: {response.status_code}"
+        done = 0
+        try:
+            for next_answer in asyncio.as_completed([answer(i, q) for i, q in enumerate(questions, start=1)]):
+                index, question, response = await next_answer
+                with metrics.stage("reply"):
+                    for chunk in chunk_text(f"✅ #{message_id} · {index}/{total}\n❓ {question}\n\n{response}"):
+                        await update.message.reply_text(chunk)
+                done += 1
+                progress_msg.update(
+                    f"🤔 Processing your request...\n"
+                    f"Request ID: #{message_id}\n"
+                    f"Answered: {done}/{total}"
+                )
+        finally:
+            await progress_msg.close()
+        await processing_msg.edit_text(f"✅ Answered {total} questions for #{message_id}")
+
+    async def _answer_text(self, text, user_id, lane):
+        """Answer a spreadsheet cell, asking the items of a question list in parallel; backend errors are raised."""
+        questions = split_questions(text)
+        if len(questions) == 1:
+            return await self._answer_question(text, user_id, lane)
+        answers = await asyncio.gather(*(self._answer_question(q, user_id, lane) for q in questions))
+        return join_answers(questions, answers)
+
+    async def _answer_question(self, question, user_id, lane):
+        """Return the answer for question, from the library, the cache or a similar question when possible."""
+        answer = self.answer_library.get(question) if self.answer_library else None
+        if answer is not None:
+            return answer
+
+        answer = self.answer_cache.get(question)
+        if answer is not None:
+            return answer
+
+        match = self.similarity_index.lookup(question) if self.similarity_index else None
+        if match is not None:
+            similar_question, answer, score = match
+            logging.info(f"Reusing answer of similar question ({score:.0%}): {similar_question!r}")
+            return f"♻️ Reused answer ({score:.0%} similar to: \"{similar_question}\")\n\n{answer}"
+
+        # A text question joining a spreadsheet row's call moves it to the interactive lane
+        return await self.in_flight.do(
+            normalize_question(question), self._ask_backend, question, Ticket(user_id, lane),
+            on_join=lambda question, ticket: self.scheduler.promote(ticket, lane)
+        )
+
+    def _text_endpoint(self):
+        return "batch" if self.batcher and self.api_client.batch_supported else "text"
+
+    async def _ask_backend(self, question, ticket):
+        if self._text_endpoint() == "batch":
+            # The batcher groups questions before they queue, each batch takes one scheduler slot
+            answer = await self.batcher.ask(question, ticket)
+        else:
+            answer = await self.scheduler.run(ticket.user_id, ticket.lane, self.api_client.ask, question, ticket=ticket)
+        self.answer_cache.set(question, answer)
+        if self.similarity_index is not None:
+            self.similarity_index.add(question, answer)
+        return answer
 
+    async def _make_api_request(self, user_message, user_id, lane=INTERACTIVE):
+        """Make API request"""
+        try:
+            return await self._answer_question(user_message, user_id, lane)
+        except (RFPApiError, CircuitOpenError) as e:
+            return str(e)
         except Exception as e:
             return f"Connection error: {e}"
 
@@ -236,7 +381,7 @@ class TelegramBot:
         
         # Add authentication check
         user_id = update.message.from_user.id
-        if user_id not in AUTHENTICATED_USERS:
+        if user_id not in self.authenticated_users:
             logging.info(f"Unauthorized access attempt from user {user_id}")
             await update.message.reply_text(
                 "❌ You are not authenticated.\n"
@@ -247,85 +392,68 @@ class TelegramBot:
         logging.info(f"Authenticated user {user_id} uploaded file: {update.message.document.file_name}")
         logging.info(f"Received file: {update.message.document.file_name}")
         
+        path = None
         try:
             document = update.message.document
             message_id = update.message.message_id
             logging.info(f"Processing document with ID: {message_id}")
 
-            # First download the file
+            # Download straight to a temporary file instead of holding the upload in memory
             logging.info("Downloading file...")
             file = await context.bot.get_file(document.file_id)
-            file_bytes = await file.download_as_bytearray()
+            fd, path = tempfile.mkstemp(prefix="rfp_", suffix=os.path.splitext(document.file_name)[1])
+            os.close(fd)
+            with metrics.stage("telegram_download", trace_id=message_id):
+                await file.download_to_drive(path)
             logging.info("File downloaded successfully")
-            
+        except Exception as e:
+            if path:
+                spreadsheet.remove_file(path)
+            await update.message.reply_text(
+                f"❌ Error reading Excel file: {str(e)}\n"
+            )
+            return
+
+        started = False
+        try:
             # Excel'i oku ve soru sayısını hesapla
             try:
                 logging.info(f"Starting to read file: {document.file_name}")
-                
-                # Check file extension
-                if document.file_name.lower().endswith('.csv'):
-                    df = pd.read_csv(io.BytesIO(file_bytes))
-                    logging.info("Reading as CSV file")
-                else:
-                    df = pd.read_excel(io.BytesIO(file_bytes), sheet_name='rfp')
-                    logging.info("Reading as Excel file")
-                
-                logging.info(f"File read successfully. Columns found: {df.columns.tolist()}")
-                
-                # Add debug logging
-                logging.info(f"Excel columns found: {df.columns.tolist()}")
-                
-                # Check for empty dataframe first
-                if df.empty:
-                    await update.message.reply_text(
-                        "❌ Error: Excel file is empty."
-                    )
-                    return
-
-                # Check for question column and make it case-insensitive
-                columns_lower = [col.lower() for col in df.columns]
-                if 'question' not in columns_lower:
-                    logging.info(f"'question' column not found in columns: {df.columns.tolist()}")
-                    await update.message.reply_text(
-                        "❌ Error: Excel file does not have 'question' column.\n"
-                        "Please make sure your Excel file has a column named 'question'.\n"
-                        f"Found columns: {', '.join(df.columns.tolist())}"
-                    )
-                    return
-
-            except Exception as e:
-                logging.error(f"Error reading Excel: {str(e)}")
-                await update.message.reply_text(
-                    f"❌ Error reading Excel file: {str(e)}\n"
-                    f"Please make sure the file has 'rfp' sheet with 'question' column."
-                )
-                return
-            #print("debug 1")
-            #print("FILE_RFP_EXCEL_COUNT: ",FILE_RFP_EXCEL_COUNT)
-            #print("type: ",type(FILE_RFP_EXCEL_COUNT))
-            # Add debug logging before the check
-            question_count = df['question'].count()
-            logging.info(f"Number of questions found: {question_count}")
-            logging.info(f"Question limit (FILE_RFP_EXCEL_COUNT): {FILE_RFP_EXCEL_COUNT}")
-
-            if question_count > FILE_RFP_EXCEL_COUNT:
-                logging.info(f"Exceeded question limit: {question_count} > {FILE_RFP_EXCEL_COUNT}")
+                logging.info(f"Reading as {'CSV' if spreadsheet.is_csv(document.file_name) else 'Excel'} file")
+                with metrics.stage("parse", trace_id=message_id):
+                    questions = await self.spreadsheet_pool.scan_questions(path, document.file_name, FILE_RFP_EXCEL_COUNT)
+            except spreadsheet.TooManyQuestionsError:
+                logging.info(f"Exceeded question limit: > {FILE_RFP_EXCEL_COUNT}")
                 await update.message.reply_text(
                     "❌ Error: Too many questions in Excel file!\n"
-                    f"Your file has {question_count} questions.\n"
+                    f"Your file has more than {FILE_RFP_EXCEL_COUNT} questions.\n"
                     f"Maximum allowed is {FILE_RFP_EXCEL_COUNT} questions.\n"
                     "Please reduce the number of questions and try again."
                 )
                 logging.info("Sent error message to user about exceeding question limit")
                 return
+            except spreadsheet.SpreadsheetError as e:
+                logging.info(f"Rejected file {document.file_name}: {e}")
+                await update.message.reply_text(f"❌ Error: {e}")
+                return
+            except Exception as e:
+                logging.error(f"Error reading Excel: {str(e)}")
+                await update.message.reply_text(
+                    f"❌ Error reading Excel file: {str(e)}\n"
+                    f"Please make sure the file has 'rfp' sheet with 'question' column."
+                )
+                return
 
-            # If we get here, the question count is okay
-            logging.info("Question count is within limits, proceeding with processing")
+            num_questions = sum(q is not None for q in questions)
+            logging.info(f"Number of questions found: {num_questions}")
+            logging.info(f"Question limit (FILE_RFP_EXCEL_COUNT): {FILE_RFP_EXCEL_COUNT}")
 
-            num_questions = len(df['question'])
-            
-            # Tahmini süreyi hesapla
-            estimated_seconds = num_questions * 30  # Her soru 30 saniye
+            # Tahmini süreyi hesapla: the backend's observed seconds per question of a whole-file upload
+            estimated_seconds = num_questions * self.upload_scheduler.service_time[BULK]
+            if EXCEL_PROCESSING_MODE == "fanout":
+                # Questions are answered in parallel batches, each taking the observed backend latency
+                parallel = min(EXCEL_FANOUT_CONCURRENCY, self.scheduler.limit(BULK))
+                estimated_seconds = math.ceil(num_questions / parallel) * self.scheduler.service_time[BULK]
             estimated_minutes = estimated_seconds / 60  # Dakikaya çevir
 
             # Hemen tahmini süreyi göster
@@ -338,153 +466,495 @@ class TelegramBot:
             )
 
             # Şimdi asıl işleme başla
-            asyncio.create_task(self._process_excel_file(update, context, message_id, file_bytes))
+            self.job_store.create(
+                chat_id=update.effective_chat.id,
+                user_id=user_id,
+                message_id=message_id,
+                filename=document.file_name,
+                source_path=path,
+                mode=EXCEL_PROCESSING_MODE,
+                questions=questions
+            )
+            started = True
+            self._claim_jobs()
 
         except Exception as e:
             await update.message.reply_text(
                 f"❌ Error reading Excel file: {str(e)}\n"
             )
+        finally:
+            # The processing task owns the file once it has been started
+            if not started:
+                spreadsheet.remove_file(path)
 
-    async def _process_excel_file(self, update, context, message_id, file_bytes):
+    async def _process_excel_file(self, job, resumed=False, handle=None):
         """Process Excel file with progress updates"""
+        job_id = job['job_id']
+        handle = handle or JobHandle(job_id)
+        chat_id = job['chat_id']
+        message_id = job['message_id']
+        filename = job['filename']
+        processing_msg = None
+        progress_msg = None
+        ticker = None
+        output_path = None
+        status = 'failed'
+        metrics.TRACE_ID.set(message_id)
         try:
-            document = update.message.document
-            
             # Send processing message
-            processing_msg = await update.message.reply_text(
-                f"⚙️ Processing Excel file...\n"
-                f"File: {document.file_name}\n"
+            header = (
+                f"{'🔄 Resuming' if resumed else '⚙️ Processing'} Excel file...\n"
+                f"File: {filename}\n"
                 f"Request ID: #{message_id}"
             )
+            processing_msg = await self.app.bot.send_message(chat_id=chat_id, text=header)
+            progress_msg = ProgressMessage(processing_msg)
 
             # Update status to processing
-            self.active_excel_files[message_id] = {
-                'filename': document.file_name,
-                'status': 'processing',
-                'start_time': time.time()
-            }
-
-            # Process in thread pool
-            result = await asyncio.get_event_loop().run_in_executor(
-                self.excel_executor,
-                self._process_excel_sync,
-                file_bytes,
-                document.file_name
-            )
+            self.job_store.set_status(job_id, 'running')
+            record = self.requests.start(job['user_id'], message_id, 'excel', filename)
+
+            library_answers = self._library_answers(job_id)
+            if job['mode'] == "fanout":
+                work = self._process_excel_fanout(job, handle, progress_msg, header, record)
+            elif library_answers is not None:
+                # Every question has a vetted answer, the backend is not needed
+                work = self.spreadsheet_pool.write_answers(job['path'], filename, library_answers)
+            else:
+                ticker = asyncio.create_task(self._update_progress(progress_msg, header, record))
+                questions = sum(q is not None for q in self.job_store.questions(job_id))
+                work = self._process_excel_request(job['path'], filename, job['user_id'], handle, questions)
+            try:
+                result = await handle.start(work)
+            except asyncio.CancelledError:
+                if not handle.cancelled or asyncio.current_task().cancelling():
+                    raise
+                # /cancel: the backend calls are aborted, hand back what was answered
+                status = 'cancelled'
+                await progress_msg.close()
+                await self._send_cancelled(job, processing_msg)
+                return
+            await progress_msg.close()
+            failed = {}
+            if job['mode'] == "fanout":
+                result, failed = result
 
             if result is None:
                 await processing_msg.edit_text(
                     f"❌ Failed to process file\n"
-                    f"File: {document.file_name}\n"
+                    f"File: {filename}\n"
                     f"Please check the file format and try again."
                 )
                 return
 
-            # Send processed file
-            await context.bot.send_document(
-                chat_id=update.effective_chat.id,
-                document=io.BytesIO(result),
-                filename=f'processed_{document.file_name}',
-                caption=f"✅ Excel processing completed!\nRequest ID: #{message_id}"
-            )
+            # Send processed file: a path when answers were written locally, else the backend's spooled download
+            if isinstance(result, str):
+                output_path = result
+                document = open(output_path, 'rb')
+            else:
+                document = result
+            caption = f"✅ Excel processing completed!\nRequest ID: #{message_id}"
+            if failed:
+                caption = (
+                    f"⚠️ Excel processing finished with {len(failed)} questions unanswered\n"
+                    f"Request ID: #{message_id}\n"
+                    f"Error: {next(iter(failed.values()))}\n"
+                    f"Send the file again to retry them."
+                )
+            with metrics.stage("send_document"), document:
+                await self.app.bot.send_document(
+                    chat_id=chat_id,
+                    document=document,
+                    filename=f'processed_{filename}',
+                    caption=caption
+                )
+            status = 'partial' if failed else 'completed'
             await processing_msg.delete()
 
+        except asyncio.CancelledError:
+            # Shutdown: leave the job queued so it resumes from its checkpoint
+            status = None
+            raise
         except Exception as e:
             logging.error(f"Error processing file: {e}")
+            if processing_msg:
+                await processing_msg.edit_text(
+                    f"❌ Error processing file\n"
+                    f"File: {filename}\n"
+                    f"Error: {str(e)}"
+                )
+        finally:
+            if ticker:
+                ticker.cancel()
+            if output_path:
+                spreadsheet.remove_file(output_path)
+            if progress_msg:
+                await progress_msg.close()
+            if status:
+                self.job_store.finish(job_id, status)
+            self.requests.finish(job['user_id'], message_id, status or 'interrupted')
+
+    async def _send_cancelled(self, job, processing_msg):
+        """Tell the user a job was cancelled, with a workbook of the rows answered before it stopped."""
+        message_id = job['message_id']
+        if job['mode'] != "fanout":
             await processing_msg.edit_text(
-                f"❌ Error processing file\n"
-                f"File: {document.file_name}\n"
-                f"Error: {str(e)}"
+                f"🛑 Excel processing cancelled\n"
+                f"File: {job['filename']}\n"
+                f"Request ID: #{message_id}"
             )
-        finally:
-            if message_id in self.active_excel_files:
-                self.active_excel_files[message_id]['status'] = 'completed'
-                self.active_excel_files[message_id]['end_time'] = time.time()
+            return
 
-    def _process_excel_sync(self, file_bytes, filename):
-        """Synchronous function to process Excel file"""
+        output_path, answered, total = await self._write_partial(job)
         try:
-            headers = {
-                "Authorization": f"Bearer {HF_TOKEN}",
-                "accept": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            }
-
-            files = {
-                'file': (
-                    filename, 
-                    file_bytes, 
-                    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            with open(output_path, 'rb') as document:
+                await self.app.bot.send_document(
+                    chat_id=job['chat_id'],
+                    document=document,
+                    filename=f"partial_{job['filename']}",
+                    caption=f"🛑 Excel processing cancelled\nRequest ID: #{message_id}\n"
+                            f"{answered}/{total} questions answered"
                 )
-            }
-
-            response = requests.post(
-                self.excel_url,
-                headers=headers,
-                files=files
-            )
-
-            if response.status_code == 200:
-                return response.content
+        finally:
+            spreadsheet.remove_file(output_path)
+        await processing_msg.delete()
+
+    async def _write_partial(self, job):
+        """Write the answers checkpointed so far into a copy of the job's workbook.
+
+        Returns (path, answered rows, question rows); the caller removes the file.
+        """
+        questions = self.job_store.questions(job['job_id'])
+        answers = self.job_store.answers(job['job_id'])
+        ordered = [answers.get(row) for row in range(len(questions))]
+        output_path = await self.spreadsheet_pool.write_answers(job['path'], job['filename'], ordered)
+        return output_path, len(answers), sum(q is not None for q in questions)
+
+    async def _process_excel_fanout(self, job, handle, progress_msg, header, record):
+        """Answer each question through the text endpoint and write the answers back into the rows.
+
+        Returns the path of the written workbook and {row: error} of the rows left unanswered.
+        """
+        job_id = job['job_id']
+        filename = job['filename']
+        questions = self.job_store.questions(job_id)
+        answers = self.job_store.answers(job_id)
+        if answers:
+            logging.info(f"Job {job_id}: {len(answers)} rows restored from checkpoint")
+
+        # Group the remaining rows so each distinct question is asked once
+        known = {normalize_question(questions[row]): answer for row, answer in answers.items()}
+        copied = []
+        pending = {}
+        for row, question in enumerate(questions):
+            if question is None or row in answers:
+                continue
+            key = normalize_question(question)
+            if key in known:
+                answers[row] = known[key]
+                copied.append((row, known[key]))
             else:
-                logging.error(f"Excel API Error: {response.status_code} - {response.text}")
+                pending.setdefault(key, []).append(row)
+        if copied:
+            self.job_store.record_answers(job_id, copied)
+
+        progress = JobProgress(
+            total=sum(q is not None for q in questions),
+            done=len(answers),
+            seconds_per_item=self.scheduler.service_time[BULK],
+            concurrency=min(EXCEL_FANOUT_CONCURRENCY, self.scheduler.limit(BULK))
+        )
+
+        # The shared state and the job store are written on the event loop, so both are written at most
+        # once per interval rather than once per answered row
+        published = checkpointed = time.monotonic()
+        unsaved = []  # (row, answer) answered since the last checkpoint
+
+        def report():
+            nonlocal published
+            record.status = f"processing ({progress.done}/{progress.total})"
+            if time.monotonic() - published >= PROGRESS_EDIT_INTERVAL or progress.done == progress.total:
+                published = time.monotonic()
+                self.requests.update(record)
+            progress_msg.update(f"{header}\n\n{progress.render()}\n\nType /partial {job['message_id']} for answers so far")
+
+        def checkpoint():
+            nonlocal checkpointed
+            checkpointed = time.monotonic()
+            if unsaved:
+                self.job_store.record_answers(job_id, unsaved)
+                unsaved.clear()
+
+        self.requests.update(record)
+        report()
+        semaphore = asyncio.Semaphore(EXCEL_FANOUT_CONCURRENCY)
+
+        failed = {}  # row -> error, left unanswered and not checkpointed so a retry asks again
+
+        async def answer(rows):
+            async with semaphore:
+                # Read per row so /priority also applies to the rows not dispatched yet
+                lane = PRIORITY if handle.prioritized else BULK
+                try:
+                    result = await self._answer_text(questions[rows[0]], job['user_id'], lane)
+                except Exception as e:
+                    logging.warning(f"Job {job_id}: no answer for row {rows[0]}: {e}")
+                    failed.update((row, e) for row in rows)
+                    return
+            # A restart asks again only the rows answered since the last checkpoint
+            unsaved.extend((row, result) for row in rows)
+            if time.monotonic() - checkpointed >= JOB_CHECKPOINT_INTERVAL:
+                checkpoint()
+            for row in rows:
+                answers[row] = result
+            progress.advance(len(rows))
+            report()
+
+        try:
+            await asyncio.gather(*(answer(rows) for rows in pending.values()))
+        finally:
+            # Also on /cancel, so a retry keeps the answers already paid for
+            checkpoint()
+        logging.info(
+            f"Answered {len(pending)} distinct questions for "
+            f"{progress.total} rows from {filename}, {len(failed)} rows failed"
+        )
+        if failed and not answers:
+            # Nothing to hand back, report why
+            raise next(iter(failed.values()))
+
+        # Serializing the workbook is CPU bound, keep it off the event loop
+        ordered = [answers.get(row) for row in range(len(questions))]
+        output_path = await self.spreadsheet_pool.write_answers(job['path'], filename, ordered)
+        return output_path, failed
+
+    def _library_answers(self, job_id):
+        """Return the library answer of every row of a job, or None unless the library answers all of them."""
+        if not self.answer_library:
+            return None
+        answers = []
+        for question in self.job_store.questions(job_id):
+            answer = self.answer_library.get(question) if question is not None else None
+            if question is not None and answer is None:
                 return None
+            answers.append(answer)
+        return answers
 
+    async def _process_excel_request(self, path, filename, user_id, handle, questions):
+        """Send the Excel file to the backend and return the processed file"""
+        handle.ticket = Ticket(user_id, PRIORITY if handle.prioritized else BULK)
+        try:
+            # Timed per question so the next upload's estimate scales with its size
+            return await self.upload_scheduler.run(
+                user_id, handle.ticket.lane, self.api_client.process_excel, path, filename,
+                ticket=handle.ticket, size=questions
+            )
+        except RFPApiError as e:
+            logging.error(f"Excel API Error: {e.status} - {e.text}")
+            return None
         except Exception as e:
             logging.error(f"Excel processing error: {e}")
             return None
 
-    async def _update_progress(self, message, message_id, filename):
-        """Update progress message periodically"""
+    async def _update_progress(self, progress_msg, header, record):
+        """Update progress message periodically while the backend processes a whole file"""
         try:
-            while message_id in self.active_excel_files:
-                elapsed_time = time.time() - self.active_excel_files[message_id]['start_time']
-                hours = int(elapsed_time // 3600)
-                minutes = int((elapsed_time % 3600) // 60)
-                
-                await message.edit_text(
-                    f"⚙️ Processing Excel file...\n"
-                    f"File: {filename}\n"
-                    f"Request ID: #{message_id}\n"
-                    f"Time elapsed: {hours}h {minutes}m\n"
-                    f"Status: {self.active_excel_files[message_id]['status']}"
+            while record.end_time is None:
+                self.requests.update(record)
+                progress_msg.update(
+                    f"{header}\n"
+                    f"Time elapsed: {format_duration(record.elapsed)}\n"
+                    f"Status: {record.status}"
                 )
-                
-                # Update every 5 minutes
-                await asyncio.sleep(300)
+                await asyncio.sleep(60)
         except Exception as e:
             logging.error(f"Error updating progress: {e}")
 
+    async def _running_job(self, update: Update, context: CallbackContext, command):
+        """Return the caller's unfinished spreadsheet job named by the command argument, replying if there is none."""
+        user_id = update.message.from_user.id
+        if user_id not in self.authenticated_users:
+            await update.message.reply_text("❌ You are not authenticated. Please type /start to authenticate and then enter the password.")
+            return None
+
+        if not context.args or not context.args[0].lstrip('#').isdigit():
+            await update.message.reply_text(f"Usage: /{command} <request id>")
+            return None
+        request_id = int(context.args[0].lstrip('#'))
+
+        job = self.job_store.find(user_id, request_id)
+        if job is None or job['status'] not in ('queued', 'running'):
+            await update.message.reply_text(f"❌ No running spreadsheet job #{request_id}")
+            return None
+        return job
+
+    async def partial_command(self, update: Update, context: CallbackContext):
+        """Send the answers collected so far for a running spreadsheet job"""
+        job = await self._running_job(update, context, "partial")
+        if job is None:
+            return
+        if job['mode'] != "fanout":
+            await update.message.reply_text("❌ Partial results are only available for per-question processing")
+            return
+
+        try:
+            output_path, answered, total = await self._write_partial(job)
+        except Exception as e:
+            logging.error(f"Error building partial results: {e}")
+            await update.message.reply_text(f"❌ Could not build partial results: {str(e)}")
+            return
+
+        try:
+            with open(output_path, 'rb') as document:
+                await update.message.reply_document(
+                    document=document,
+                    filename=f"partial_{job['filename']}",
+                    caption=f"📎 Partial results for #{job['message_id']}: {answered}/{total} questions answered"
+                )
+        finally:
+            spreadsheet.remove_file(output_path)
+
+    async def cancel_command(self, update: Update, context: CallbackContext):
+        """Stop a spreadsheet job; the answers collected so far are sent back"""
+        job = await self._running_job(update, context, "cancel")
+        if job is None:
+            return
+        job = self.job_store.request_cancel(job['job_id'])
+        if job is None:
+            await update.message.reply_text("❌ The job finished before it could be cancelled")
+            return
+
+        handle = self.jobs.get(job['job_id'])
+        if handle:
+            handle.cancel()
+        elif job['owner'] is None:
+            # Still waiting for a worker, nothing was answered
+            self.job_store.finish(job['job_id'], 'cancelled')
+            await update.message.reply_text(f"🛑 Request #{job['message_id']} cancelled before it started")
+            return
+        # Otherwise the worker running it picks the request up within JOB_CONTROL_INTERVAL
+        await update.message.reply_text(f"🛑 Cancelling request #{job['message_id']}...")
+
+    async def priority_command(self, update: Update, context: CallbackContext):
+        """Serve a spreadsheet job's remaining rows ahead of the caller's other spreadsheets"""
+        job = await self._running_job(update, context, "priority")
+        if job is None:
+            return
+        if not self.job_store.prioritize(job['job_id']):
+            await update.message.reply_text("❌ The job finished before it could be prioritized")
+            return
+
+        handle = self.jobs.get(job['job_id'])
+        if handle and not self._prioritize(handle):
+            await update.message.reply_text(
+                f"⏳ Request #{job['message_id']} is already being processed by the backend, "
+                f"only files still waiting can be moved ahead of your other files"
+            )
+            return
+        await update.message.reply_text(f"⏫ Request #{job['message_id']} moved ahead of your other files")
+
+    def _prioritize(self, handle):
+        """Serve a job's remaining work ahead of its user's other spreadsheets; False if its upload already left the queue."""
+        # Rows read the flag when dispatched, a whole-file upload waiting for a slot is moved
+        handle.prioritized = True
+        if handle.ticket is None:
+            return True
+        self.upload_scheduler.promote(handle.ticket, PRIORITY)
+        return not handle.ticket.granted
+
     async def status_command(self, update: Update, context: CallbackContext):
-        """Show status of all active processes"""
+        """Show the caller's recent requests and overall service health"""
+        user_id = update.message.from_user.id
+        if user_id not in self.authenticated_users:
+            await update.message.reply_text("❌ You are not authenticated. Please type /start to authenticate and then enter the password.")
+            return
+
         status_message = "Current Status:\n\n"
+        records = self.requests.for_user(user_id)
+        text_requests = [r for r in records if r.kind == 'text']
+        excel_files = [r for r in records if r.kind == 'excel']
 
         # Text requests status
-        if self.active_requests:
+        if text_requests:
             status_message += "📝 Text Requests:\n"
-            for msg_id, info in self.active_requests.items():
-                current_time = time.time()
-                processing_time = current_time - info['start_time']
+            for record in text_requests:
                 status_message += (
-                    f"Request #{msg_id}:\n"
-                    f"├─ Status: {info['status']}\n"
-                    f"└─ Time: {processing_time:.1f}s\n\n"
+                    f"Request #{record.request_id}:\n"
+                    f"├─ Status: {record.status}\n"
+                    f"└─ Time: {record.elapsed:.1f}s\n\n"
                 )
 
         # Excel files status
-        if self.active_excel_files:
+        if excel_files:
             status_message += "📊 Excel Files:\n"
-            for msg_id, info in self.active_excel_files.items():
-                current_time = time.time()
-                processing_time = current_time - info['start_time']
+            for record in excel_files:
                 status_message += (
-                    f"File #{msg_id}:\n"
-                    f"├─ Name: {info['filename']}\n"
-                    f"├─ Status: {info['status']}\n"
-                    f"└─ Time: {processing_time:.1f}s\n\n"
+                    f"File #{record.request_id}:\n"
+                    f"├─ Name: {record.filename}\n"
+                    f"├─ Status: {record.status}\n"
+                    f"└─ Time: {record.elapsed:.1f}s\n\n"
                 )
 
-        if not self.active_requests and not self.active_excel_files:
-            status_message += "No active processes"
+        if not records:
+            status_message += "No active processes\n\n"
+
+        # Recent completions across all users
+        for kind, stats in self.requests.stats().items():
+            status_message += (
+                f"📈 Recent {kind}: {stats['count']} done, {stats['failed']} failed, "
+                f"avg {stats['mean']:.1f}s, p95 {stats['p95']:.1f}s\n"
+            )
+
+        scheduler_stats = self.scheduler.stats()
+        status_message += (
+            f"🚦 Backend slots: {scheduler_stats['active']}/{scheduler_stats['concurrency']} busy, "
+            f"{scheduler_stats[INTERACTIVE]} text, {scheduler_stats[PRIORITY]} prioritized and "
+            f"{scheduler_stats[BULK]} spreadsheet calls queued\n"
+        )
+        upload_stats = self.upload_scheduler.stats()
+        status_message += (
+            f"📤 Spreadsheet uploads: {upload_stats['active']}/{upload_stats['concurrency']} at the backend, "
+            f"{upload_stats[PRIORITY] + upload_stats[BULK]} queued\n"
+        )
+
+        loop_stats = self.watchdog.stats()
+        status_message += (
+            f"🩺 Event loop: lag p99 {loop_stats['lag_p99'] * 1000:.0f}ms, "
+            f"max {loop_stats['lag_max'] * 1000:.0f}ms over the last minute, {loop_stats['tasks']} tasks, "
+            f"{loop_stats['stalls']} stalls"
+        )
+        if loop_stats['last_stall']:
+            status_message += f" (last blocked {loop_stats['last_stall'][0]:.1f}s)"
+        status_message += f", {loop_stats['executors']['spreadsheet_pool']} spreadsheet tasks queued\n"
+
+        api_stats = self.api_client.stats()
+        status_message += (
+            f"🔌 Backend: circuit {api_stats['breaker']}, "
+            f"{api_stats['in_flight']}/{api_stats['concurrency_limit']} calls in flight\n"
+        )
+        # Backends are numbered, their URLs are internal
+        for number, backend in enumerate(api_stats.get('backends', ()), start=1):
+            latency = f"{backend['latency']:.2f}s" if backend['latency'] is not None else "unmeasured"
+            status_message += (
+                f"   └─ backend {number}: {'up' if backend['healthy'] else 'down'}, "
+                f"circuit {backend['breaker']}, {latency}, {backend['outstanding']} in flight\n"
+            )
+        if api_stats.get('hedges'):
+            status_message += f"🏁 Hedged {api_stats['hedges']} slow questions, {api_stats['hedge_wins']} answered by the second backend\n"
+
+        if self.answer_library:
+            library_stats = self.answer_library.stats()
+            status_message += (
+                f"📚 Answer library: {library_stats['answers']} answers, "
+                f"{library_stats['hits']}/{library_stats['lookups']} questions answered from it\n"
+            )
+
+        cache_stats = self.answer_cache.stats()
+        status_message += (
+            f"🗂 Answer cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['size']} entries, "
+            f"{self.in_flight.collapsed} questions joined an identical one in flight"
+        )
 
         await update.message.reply_text(status_message)
 
@@ -493,6 +963,9 @@ class TelegramBot:
         logging.info("Setting up message handlers...")
         self.app.add_handler(CommandHandler("start", self.start_command))
         self.app.add_handler(CommandHandler("status", self.status_command))
+        self.app.add_handler(CommandHandler("partial", self.partial_command))
+        self.app.add_handler(CommandHandler("cancel", self.cancel_command))
+        self.app.add_handler(CommandHandler("priority", self.priority_command))
         self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
         
         # Update Excel handler to include CSV files
@@ -503,22 +976,174 @@ class TelegramBot:
             self.handle_excel
         ))
 
-    async def run(self):
-        """Start the bot and listen for messages."""
+    async def run(self, webhook_url=None, register_webhook=WEBHOOK_REGISTER):
+        """Start the bot and listen for messages, by long polling or, given webhook_url, by webhook.
+
+        Unless register_webhook is False the webhook is registered with Telegram; otherwise updates
+        signed with WEBHOOK_SECRET are accepted from whoever POSTs them.
+        """
         logging.info("Starting Telegram bot...")
+        self.watchdog.start()
         await self.app.initialize()
         await self.app.start()
-        await self.app.updater.start_polling()
+        if webhook_url:
+            secret = WEBHOOK_SECRET
+            if not secret:
+                if not register_webhook:
+                    # Nobody could learn a generated secret, every update would be rejected
+                    raise RuntimeError("WEBHOOK_SECRET must be set when the webhook is not registered with Telegram")
+                if self.state.shared or int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+                    # Each worker would register its own secret and reject the updates sent with the others'
+                    raise RuntimeError("WEBHOOK_SECRET must be set when several workers receive the webhook")
+                secret = secrets.token_urlsafe(32)
+            if register_webhook:
+                logging.info(f"Registering webhook at {webhook_url}")
+                await self.app.bot.set_webhook(
+                    url=webhook_url,
+                    secret_token=secret,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            else:
+                logging.info(f"Accepting webhook updates at {webhook_url} without registering it with Telegram")
+            self.webhook_secret = secret
+        else:
+            if self.state.shared or int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+                # Telegram delivers each update to one getUpdates caller and rejects concurrent pollers
+                logging.warning("Long polling supports a single worker; set WEBHOOK_URL to run several")
+            await self.app.updater.start_polling()
+        startup.mark("ready")
+        startup.report()
+        self.resume_jobs()
+        asyncio.create_task(self._load_similarity_index())
+        asyncio.create_task(self._load_answer_library())
+
+    async def _load_answer_library(self):
+        """Memory-map the imported answer library without delaying startup."""
+        try:
+            module = await asyncio.to_thread(importlib.import_module, "answer_library")
+            self.answer_library = await asyncio.to_thread(module.AnswerLibrary)
+            startup.mark("answer_library")
+        except Exception as e:
+            logging.error(f"Could not open the answer library: {e}")
+
+    async def _load_similarity_index(self):
+        """Index the cached questions for near-duplicate lookups without delaying startup."""
+        if SIMILARITY_THRESHOLD <= 0:
+            # Reuse is off, the index would never be read
+            return
+        try:
+            # numpy is imported off the event loop
+            module = await asyncio.to_thread(importlib.import_module, "similarity_index")
+            # Sized and expiring like the answer cache, so reuse does not outlive cached answers
+            index = module.SimilarityIndex(max_size=self.answer_cache.capacity, ttl=self.answer_cache.ttl)
+            for count, (question, answer, stored_at) in enumerate(list(self.answer_cache.items()), start=1):
+                index.add(question, answer, stored_at)
+                if count % 1000 == 0:
+                    await asyncio.sleep(0)
+            self.similarity_index = index
+            startup.mark("similarity_index")
+            logging.info(f"Similarity index loaded with {len(index)} questions")
+        except Exception as e:
+            logging.error(f"Could not build the similarity index: {e}")
+
+    async def process_webhook_update(self, data, secret_token=None):
+        """Dispatch one update received by webhook; returns False if the secret token does not match."""
+        if self.webhook_secret is None or not hmac.compare_digest(secret_token or "", self.webhook_secret):
+            logging.warning("Rejected webhook update with an invalid secret token")
+            return False
+
+        update = Update.de_json(data, self.app.bot)
+        # Handle in the background so Telegram gets its 200 without waiting for the handlers
+        self.app.create_task(self.app.process_update(update), update=update)
+        return True
+
+    def resume_jobs(self):
+        """Restart spreadsheet jobs left unfinished by a previous process."""
+        # A single process owns every job; shared workers only take over jobs whose lease ran out
+        self._claim_jobs(takeover=not self.state.shared)
+        self.job_loop = asyncio.create_task(self._run_job_loop())
+        if SPREADSHEET_PREWARM:
+            asyncio.create_task(self.spreadsheet_pool.warm())
+
+    def _claim_jobs(self, takeover=False):
+        """Start queued spreadsheet jobs this worker has room for; busy workers leave them to the others."""
+        limit = None
+        if WORKER_MAX_JOBS:
+            limit = WORKER_MAX_JOBS - len(self.jobs)
+            if limit <= 0:
+                return
+        for job in self.job_store.claim(self.worker, limit=limit, takeover=takeover):
+            resumed = job['status'] == 'running'
+            if resumed:
+                logging.info(f"Resuming job {job['job_id']} ({job['filename']}) for chat {job['chat_id']}")
+            handle = JobHandle(job['job_id'], prioritized=bool(job['priority']))
+            if job['status'] == 'cancelling':
+                # Cancelled while its previous worker was stopping
+                handle.cancel()
+            handle.task = asyncio.create_task(self._process_excel_file(job, resumed=resumed, handle=handle))
+            self.jobs[job['job_id']] = handle
+            handle.task.add_done_callback(lambda task, job_id=job['job_id']: self._job_done(job_id, task))
+
+    def _job_done(self, job_id, task):
+        self.jobs.pop(job_id, None)
+        if not task.cancelled():
+            self._claim_jobs()
+
+    async def _run_job_loop(self):
+        """Keep the leases of running jobs alive, pick up jobs queued or orphaned by other workers
+        and apply /cancel and /priority requests received by other workers."""
+        renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(JOB_CONTROL_INTERVAL if self.state.shared else JOB_LEASE / 3)
+            try:
+                if self.state.shared:
+                    self._apply_job_controls()
+                if time.monotonic() - renewed >= JOB_LEASE / 3:
+                    renewed = time.monotonic()
+                    self.job_store.renew(self.worker)
+                    self._claim_jobs()
+            except Exception as e:
+                logging.error(f"Job queue error: {e}")
+
+    def _apply_job_controls(self):
+        for control in self.job_store.controls(self.worker):
+            handle = self.jobs.get(control['job_id'])
+            if handle is None:
+                continue
+            if control['status'] == 'cancelling' and not handle.cancelled:
+                logging.info(f"Cancelling job {handle.job_id} on request")
+                handle.cancel()
+            if control['priority'] and not handle.prioritized:
+                self._prioritize(handle)
     
     async def bot_stop(self):
         """Stop the bot."""
         logging.info("Stopping Telegram bot...")
-        if self.app.updater:
+        if self.app.updater and self.app.updater.running:
             await self.app.updater.stop()
+        self.watchdog.stop()
+        if self.job_loop:
+            self.job_loop.cancel()
+        # Interrupt running jobs while the bot, clients and stores are still open, they resume from their
+        # checkpoints; a job finishing after the bot closed would fail to send and drop them
+        jobs = [handle.task for handle in self.jobs.values()]
+        for task in jobs:
+            task.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
         await self.app.stop()
         await self.app.shutdown()
+        if self.batcher:
+            await self.batcher.close()
+        await self.api_client.close()
+        self.answer_cache.close()
+        self.spreadsheet_pool.close()
+        # Let another worker continue our jobs from their checkpoints right away
+        self.job_store.release(self.worker)
+        self.job_store.close()
+        self.state.close()
 
 def init_bot():
+    startup.mark("imports")
     load_dotenv()
     logging.info("Initializing bot...")
     
@@ -0,0 +1,246 @@
+import os
+import time
+import shutil
+import logging
+import asyncio
+import sqlite3
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR", os.path.join(DATA_DIR, "jobs"))
+JOB_LEASE = float(os.getenv("JOB_LEASE", "60"))  # Seconds before another worker may take over an unrenewed job
+JOB_CHECKPOINT_INTERVAL = float(os.getenv("JOB_CHECKPOINT_INTERVAL", "2"))  # Min seconds between answer checkpoints of a running job
+# Seconds a query waits for another worker's write lock; the bot queries on its event loop, so keep it short
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL,
+    priority INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS job_rows (
+    job_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    question TEXT,
+    answer TEXT,
+    PRIMARY KEY (job_id, row)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_user_message ON jobs (user_id, message_id);
+"""
+
+
+class JobStore:
+    """Durable spreadsheet job queue with per-row answer checkpoints, stored in SQLite."""
+
+    def __init__(self, path=JOB_STORE_PATH, files_dir=JOB_FILES_DIR):
+        self.files_dir = files_dir
+        os.makedirs(files_dir, exist_ok=True)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # Stores created before jobs were leased to workers or could be prioritized
+        columns = {row['name'] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (('owner', 'TEXT'), ('lease_until', 'REAL'), ('priority', 'INTEGER NOT NULL DEFAULT 0')):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        logging.info(f"Job store opened at {path}")
+
+    def create(self, chat_id, user_id, message_id, filename, source_path, mode, questions):
+        """Persist a new job, moving its upload into the job directory, and return the job record."""
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN")
+            cursor = self._db.execute(
+                "INSERT INTO jobs (chat_id, user_id, message_id, filename, path, mode, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, '', ?, 'queued', ?, ?)",
+                (chat_id, user_id, message_id, filename, mode, now, now)
+            )
+            job_id = cursor.lastrowid
+            path = os.path.join(self.files_dir, f"{job_id}{os.path.splitext(filename)[1]}")
+            shutil.move(source_path, path)
+            self._db.execute("UPDATE jobs SET path = ? WHERE job_id = ?", (path, job_id))
+            self._db.executemany(
+                "INSERT INTO job_rows (job_id, row, question) VALUES (?, ?, ?)",
+                ((job_id, row, question) for row, question in enumerate(questions))
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find(self, user_id, message_id):
+        """Return the newest job a user started with the given Request ID, or None."""
+        row = self._db.execute(
+            "SELECT * FROM jobs WHERE user_id = ? AND message_id = ? ORDER BY job_id DESC LIMIT 1",
+            (user_id, message_id)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def questions(self, job_id):
+        """Return the question of every data row, None for empty cells."""
+        rows = self._db.execute("SELECT question FROM job_rows WHERE job_id = ? ORDER BY row", (job_id,))
+        return [row['question'] for row in rows]
+
+    def answers(self, job_id):
+        """Return {row: answer} for every row answered so far."""
+        rows = self._db.execute(
+            "SELECT row, answer FROM job_rows WHERE job_id = ? AND answer IS NOT NULL", (job_id,)
+        )
+        return {row['row']: row['answer'] for row in rows}
+
+    def record_answers(self, job_id, answers):
+        """Checkpoint answers given as (row, answer) pairs."""
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE job_rows SET answer = ? WHERE job_id = ? AND row = ?",
+                ((answer, job_id, row) for row, answer in answers)
+            )
+            self._db.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def set_status(self, job_id, status):
+        """Update an unfinished job's status; a pending cancellation is kept."""
+        self._db.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status != 'cancelling'",
+            (status, time.time(), job_id)
+        )
+
+    def request_cancel(self, job_id):
+        """Flag an unfinished job for cancellation and return its record, or None if it already finished."""
+        cursor = self._db.execute(
+            "UPDATE jobs SET status = 'cancelling', updated_at = ? "
+            "WHERE job_id = ? AND status IN ('queued', 'running', 'cancelling')",
+            (time.time(), job_id)
+        )
+        return self.get(job_id) if cursor.rowcount else None
+
+    def prioritize(self, job_id):
+        """Move an unfinished job ahead of its user's other spreadsheets; returns False if it already finished."""
+        cursor = self._db.execute(
+            "UPDATE jobs SET priority = 1 WHERE job_id = ? AND status IN ('queued', 'running')", (job_id,)
+        )
+        return cursor.rowcount > 0
+
+    def controls(self, owner):
+        """Return the jobs held by owner that were cancelled or prioritized, possibly from another worker."""
+        rows = self._db.execute(
+            "SELECT job_id, status, priority FROM jobs WHERE owner = ? "
+            "AND (status = 'cancelling' OR (status IN ('queued', 'running') AND priority))",
+            (owner,)
+        )
+        return [dict(row) for row in rows]
+
+    def claim(self, owner, lease=JOB_LEASE, limit=None, takeover=False):
+        """Atomically take queued jobs, and jobs whose owner stopped renewing its lease, for owner.
+
+        Returns the claimed job records, oldest first and at most limit of them; a user's prioritized jobs
+        take the place of that user's oldest one, so /priority never jumps other users' queued jobs.
+        Every worker may call this concurrently; nothing is claimed while another worker holds the write lock.
+        takeover also claims jobs with a live lease, owner's included, for a single process restarting after a crash.
+        """
+        now = time.time()
+        with self._db:
+            # IMMEDIATE takes the write lock up front so two workers cannot claim the same job
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                # Another worker is claiming, the next pass of the job loop tries again
+                logging.info(f"Job queue busy, not claiming now: {e}")
+                return []
+            rows = self._db.execute(
+                "SELECT job_id, user_id, priority FROM jobs WHERE status IN ('queued', 'running', 'cancelling') "
+                "AND (owner IS NULL OR ? OR (owner != ? AND lease_until < ?)) ORDER BY job_id",
+                (takeover, owner, now)
+            ).fetchall()
+            # Each user's jobs keep that user's places in the queue, prioritized ones taking the earliest
+            by_user = {}
+            for row in rows:
+                by_user.setdefault(row['user_id'], []).append(row)
+            places = {}
+            for jobs in by_user.values():
+                ordered = sorted(jobs, key=lambda row: (-row['priority'], row['job_id']))
+                places.update(zip((row['job_id'] for row in ordered), (row['job_id'] for row in jobs)))
+            job_ids = sorted(places, key=places.get)[:limit]
+            self._db.executemany(
+                "UPDATE jobs SET owner = ?, lease_until = ? WHERE job_id = ?",
+                ((owner, now + lease, job_id) for job_id in job_ids)
+            )
+        return [self.get(job_id) for job_id in job_ids]
+
+    def renew(self, owner, lease=JOB_LEASE):
+        """Extend the lease of every unfinished job held by owner."""
+        self._db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN ('queued', 'running', 'cancelling')",
+            (time.time() + lease, owner)
+        )
+
+    def release(self, owner):
+        """Hand owner's unfinished jobs back to the queue, e.g. on shutdown."""
+        self._db.execute(
+            "UPDATE jobs SET owner = NULL, lease_until = NULL "
+            "WHERE owner = ? AND status IN ('queued', 'running', 'cancelling')",
+            (owner,)
+        )
+
+    def finish(self, job_id, status):
+        """Mark a job finished and drop its upload and row checkpoints."""
+        job = self.get(job_id)
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM job_rows WHERE job_id = ?", (job_id,))
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), job_id)
+            )
+        if job and job['path']:
+            try:
+                os.remove(job['path'])
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        self._db.close()
+
+
+class JobHandle:
+    """Control over a job running in this worker: /cancel stops its backend work, /priority moves its rows ahead."""
+
+    __slots__ = ('job_id', 'task', 'work', 'cancelled', 'prioritized', 'ticket')
+
+    def __init__(self, job_id, prioritized=False):
+        self.job_id = job_id
+        self.task = None  # The whole job, cancelled on shutdown
+        self.work = None  # The backend calls, cancelled by the user
+        self.cancelled = False
+        self.prioritized = prioritized
+        self.ticket = None  # The whole-file upload's place in the upload queue
+
+    def start(self, coro):
+        """Run the job's backend work as its own task so it can be cancelled without the job."""
+        self.work = asyncio.ensure_future(coro)
+        if self.cancelled:
+            self.work.cancel()
+        return self.work
+
+    def cancel(self):
+        """Stop dispatching rows and abort the calls in flight; the job then returns what it has."""
+        self.cancelled = True
+        if self.work is not None:
+            self.work.cancel()
@@ -1,3 +1,4 @@
+import startup  # First, so startup timings include every import  # noqa: F401
 import asyncio
 import logging
 import time
@@ -6,12 +7,6 @@ from bot_telegram import init_bot
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-async def heartbeat():
-    """Send periodic heartbeat to keep the bot active"""
-    while True:
-        logging.info("Bot heartbeat - Running...")
-        await asyncio.sleep(300)  # Log every 5 minutes
-
 async def main():
     try:
         # Initialize the bot
@@ -21,12 +16,10 @@ async def main():
         # Run the bot
         await bot.run()
         
-        # Start heartbeat
-        heartbeat_task = asyncio.create_task(heartbeat())
-        
-        # Keep the bot running with multiple tasks
+        # The watchdog replaces the heartbeat: it logs loop health every WATCHDOG_REPORT_INTERVAL
+        # seconds and dumps stacks when the loop is blocked
         tasks = [
-            heartbeat_task,
+            bot.watchdog.task,
             # Add any other background tasks here
         ]
         
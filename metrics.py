@@ -0,0 +1,133 @@
+import os
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "").lower() in ("1", "true", "yes")  # Log every stage timing
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_REGISTRY = []
+
+# Request ID (#message_id) of the request being handled by the current task
+TRACE_ID = ContextVar("trace_id", default=None)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels, rendered in Prometheus text format."""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose values come from a callback returning a number or {labels tuple: number}."""
+
+    def __init__(self, name, documentation, callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        _REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        if self.callback is None:
+            return lines
+        try:
+            values = self.callback()
+        except Exception as e:
+            logging.error(f"Gauge {self.name} failed: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        _REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("rfp_stage_seconds", "Time spent in each request-handling stage")
+BACKEND_REQUESTS = Counter("rfp_backend_requests_total", "Backend HTTP attempts by endpoint and outcome")
+
+# Callbacks are attached by the bot once its components exist
+ANSWER_CACHE = Gauge("rfp_answer_cache", "Answer cache hits, misses and size")
+QUEUE_DEPTH = Gauge("rfp_queue_depth", "Backend calls waiting in the scheduler by lane")
+BACKEND_SLOTS = Gauge("rfp_backend_slots", "Scheduler slots and backend calls in flight")
+COALESCED = Gauge("rfp_coalesced_questions", "Backend question calls made and identical questions that joined one in flight")
+
+
+@contextmanager
+def stage(name, trace_id=None, **labels):
+    """Time the enclosed block as one stage of a request, logging it under the request's trace ID."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name, **labels)
+        if trace_id is None:
+            trace_id = TRACE_ID.get()
+        if TRACE_REQUESTS and trace_id is not None:
+            logging.info(f"[#{trace_id}] {name} {labels or ''} took {elapsed:.3f}s")
+
+
+def render():
+    """Return every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+import logging
+from telegram.error import RetryAfter, BadRequest
+
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "5"))  # Min seconds between edits of one message
+
+
+def format_duration(seconds):
+    seconds = int(max(seconds, 0))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds}s"
+
+
+class ProgressMessage:
+    """Coalesces edits of one Telegram message: only the newest text is sent, at most once per interval."""
+
+    def __init__(self, message, interval=PROGRESS_EDIT_INTERVAL):
+        self.message = message
+        self.interval = interval
+        self.edits = 0
+        self._text = getattr(message, 'text', None)
+        self._pending = None
+        self._last_edit = 0.0
+        self._task = None
+
+    def update(self, text):
+        """Queue text as the next content of the message, replacing any edit not yet sent."""
+        self._pending = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Text queued while an edit was in flight goes out in the next interval
+        while self._pending is not None:
+            await asyncio.sleep(max(0.0, self._last_edit + self.interval - time.monotonic()))
+            await self._flush()
+
+    async def _flush(self):
+        text, self._pending = self._pending, None
+        if text is None or text == self._text:
+            return
+        try:
+            await self.message.edit_text(text)
+            self._text = text
+            self.edits += 1
+        except RetryAfter as e:
+            # Telegram asked us to slow down; keep the newest text and try again later
+            self._pending = self._pending or text
+            await asyncio.sleep(e.retry_after)
+            await self._flush()
+        except BadRequest as e:
+            logging.warning(f"Progress edit rejected: {e}")
+        finally:
+            self._last_edit = time.monotonic()
+
+    async def close(self):
+        """Stop scheduled edits without sending them."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._pending = None
+
+
+class JobProgress:
+    """Counts answered rows of a job and derives throughput and ETA from observed latency."""
+
+    def __init__(self, total, done=0, seconds_per_item=30.0, concurrency=1):
+        self.total = total
+        self.done = done
+        self._resumed = done
+        self.seconds_per_item = seconds_per_item  # Fallback until the first answer arrives
+        self.concurrency = max(1, concurrency)
+        self.started = time.monotonic()
+
+    def advance(self, count=1):
+        self.done += count
+
+    @property
+    def throughput(self):
+        """Rows per second answered since the job (re)started, None before the first answer."""
+        elapsed = time.monotonic() - self.started
+        answered = self.done - self._resumed
+        if answered <= 0 or elapsed <= 0:
+            return None
+        return answered / elapsed
+
+    @property
+    def eta(self):
+        remaining = self.total - self.done
+        if self.throughput:
+            return remaining / self.throughput
+        return -(-remaining // self.concurrency) * self.seconds_per_item
+
+    def render(self):
+        throughput = self.throughput
+        rate = f"{throughput * 60:.1f} questions/min" if throughput else "measuring..."
+        return (
+            f"Progress: {self.done}/{self.total} questions\n"
+            f"Throughput: {rate}\n"
+            f"Time elapsed: {format_duration(time.monotonic() - self.started)}\n"
+            f"ETA: {format_duration(self.eta)}"
+        )
@@ -0,0 +1,59 @@
+import os
+import re
+
+SPLIT_QUESTION_LISTS = os.getenv("SPLIT_QUESTION_LISTS", "1").lower() in ("1", "true", "yes")  # Answer list items separately
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# "1.", "1)", "(1)", "Q1:", "a)", "-", "*", "•" at the start of a line
+_ITEM_MARKER = re.compile(r"^\s*(?:\(?\d{1,3}[.)]|\(?[a-zA-Z][.)]|Q\d{1,3}[.:)]|[-*•●▪–])\s+(?=\S)")
+
+
+def split_questions(text):
+    """Split a numbered or bulleted list into its items; anything else is returned as one question.
+
+    Lines without a marker continue the previous item. Text before the first item, such as
+    "Which IdPs do you support:", is the context of every item and is put in front of each.
+    """
+    lead_in = []
+    items = []
+    current = None
+    for line in str(text).splitlines():
+        match = _ITEM_MARKER.match(line)
+        if match:
+            if current:
+                items.append(" ".join(current))
+            current = [line[match.end():].strip()]
+        elif current is not None and line.strip():
+            current.append(line.strip())
+        elif line.strip():
+            lead_in.append(line.strip())
+    if current:
+        items.append(" ".join(current))
+
+    if not SPLIT_QUESTION_LISTS or len(items) < 2:
+        return [str(text).strip()]
+    if lead_in:
+        return [f"{' '.join(lead_in)} {item}" for item in items]
+    return items
+
+
+def join_answers(questions, answers):
+    """Combine the answers of a split list into one numbered text."""
+    return "\n\n".join(f"{index}. {question}\n{answer}" for index, (question, answer)
+                       in enumerate(zip(questions, answers), start=1))
+
+
+def chunk_text(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Split text into pieces that fit in one Telegram message, preferring line boundaries."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+import sqlite3
+from collections import deque
+
+from state_backend import worker_id
+
+REGISTRY_TTL = float(os.getenv("REGISTRY_TTL", "3600"))  # Seconds a completed request stays in /status
+REGISTRY_HISTORY = int(os.getenv("REGISTRY_HISTORY", "1000"))  # Recent completions kept for stats
+
+
+class RequestRecord:
+    """One text request or spreadsheet job shown by /status."""
+
+    __slots__ = ('request_id', 'user_id', 'kind', 'filename', 'status', 'start_time', 'end_time')
+
+    def __init__(self, request_id, user_id, kind, filename=None):
+        self.request_id = request_id
+        self.user_id = user_id
+        self.kind = kind
+        self.filename = filename
+        self.status = 'processing'
+        self.start_time = time.time()
+        self.end_time = None
+
+    @property
+    def elapsed(self):
+        return (self.end_time or time.time()) - self.start_time
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls(data['request_id'], data['user_id'], data['kind'], data['filename'])
+        record.status = data['status']
+        record.start_time = data['start_time']
+        record.end_time = data['end_time']
+        return record
+
+
+class RequestRegistry:
+    """Per-user index of requests; completed ones expire after a TTL and leave only a fixed-size history.
+
+    Given a shared state backend, records are also published there so /status on any worker sees them,
+    and each worker publishes its recent completions in a ring of history slots for the shared stats.
+    """
+
+    def __init__(self, ttl=REGISTRY_TTL, history=REGISTRY_HISTORY, state=None, worker=None):
+        self.ttl = ttl
+        self.state = state
+        self.worker = worker or worker_id()
+        self._completions = 0
+        self._by_user = {}  # user_id -> {request_id: RequestRecord}
+        self._expiry = deque()  # (expires_at, user_id, request_id) in completion order
+        self._history = deque(maxlen=history)  # (kind, status, seconds) of recent completions
+
+    def start(self, user_id, request_id, kind, filename=None):
+        """Register a request as processing and return its record."""
+        self._evict()
+        record = RequestRecord(request_id, user_id, kind, filename)
+        self._by_user.setdefault(user_id, {})[request_id] = record
+        self.update(record)
+        return record
+
+    def update(self, record):
+        """Publish a changed status to the other workers; records of a crashed worker expire after the TTL."""
+        if self.state is None:
+            return
+        try:
+            self.state.put('requests', f"{record.user_id}:{record.request_id}", record.to_dict(), ttl=self.ttl)
+        except sqlite3.OperationalError as e:
+            # Another worker holds the write lock; /status shows the previous status until the next update
+            logging.warning(f"Request {record.request_id} status not published: {e}")
+
+    def get(self, user_id, request_id):
+        return self._by_user.get(user_id, {}).get(request_id)
+
+    def finish(self, user_id, request_id, status='completed'):
+        """Mark a request done and schedule its removal."""
+        record = self.get(user_id, request_id)
+        if record is None or record.end_time is not None:
+            return
+        record.status = status
+        record.end_time = time.time()
+        self._history.append((record.kind, status, record.elapsed))
+        if self.state is not None:
+            slot = self._completions % self._history.maxlen
+            self.state.put('history', f"{self.worker}:{slot}", [record.kind, status, record.elapsed], ttl=self.ttl)
+        self._completions += 1
+        self._expiry.append((time.monotonic() + self.ttl, user_id, request_id))
+        self.update(record)
+        self._evict()
+
+    def for_user(self, user_id):
+        """Return the caller's live and recently completed requests, oldest first."""
+        self._evict()
+        records = dict(self._by_user.get(user_id, {}))
+        if self.state is not None:
+            for _, data in self.state.scan('requests', f"{user_id}:"):
+                # This worker's own records carry the freshest status
+                records.setdefault(data['request_id'], RequestRecord.from_dict(data))
+        return sorted(records.values(), key=lambda record: record.start_time)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, user_id, request_id = self._expiry.popleft()
+            records = self._by_user.get(user_id)
+            if records is None:
+                continue
+            record = records.get(request_id)
+            # A newer request may have reused the ID since this one finished
+            if record is not None and record.end_time is not None:
+                del records[request_id]
+            if not records:
+                del self._by_user[user_id]
+
+    def stats(self):
+        """Return {kind: {'count', 'failed', 'mean', 'p95'}} over the recent completions.
+
+        With shared state these are the latest completions of every worker, at most history per worker.
+        """
+        history = self._history
+        if self.state is not None:
+            history = [tuple(completion) for _, completion in self.state.scan('history')]
+
+        durations = {}
+        failed = {}
+        for kind, status, seconds in history:
+            durations.setdefault(kind, []).append(seconds)
+            failed[kind] = failed.get(kind, 0) + (status != 'completed')
+
+        stats = {}
+        for kind, values in durations.items():
+            values.sort()
+            stats[kind] = {
+                'count': len(values),
+                'failed': failed[kind],
+                'mean': sum(values) / len(values),
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))]
+            }
+        return stats
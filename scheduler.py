@@ -0,0 +1,220 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+import metrics
+
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "10"))  # Backend calls in flight across all users
+SCHEDULER_INTERACTIVE_WEIGHT = int(os.getenv("SCHEDULER_INTERACTIVE_WEIGHT", "4"))  # Interactive grants per bulk grant
+SCHEDULER_INTERACTIVE_RESERVED = int(os.getenv("SCHEDULER_INTERACTIVE_RESERVED", "2"))  # Slots bulk rows never take
+
+INTERACTIVE = 'interactive'
+PRIORITY = 'priority'  # Rows of spreadsheet jobs a user moved ahead of their other jobs with /priority
+BULK = 'bulk'
+LANES = (INTERACTIVE, PRIORITY, BULK)  # Most urgent first
+
+
+class Ticket:
+    """A call's place with the scheduler, which promote() can move to a more urgent lane while it waits."""
+
+    __slots__ = ('user_id', 'lane', 'waiter')
+
+    def __init__(self, user_id, lane):
+        self.user_id = user_id
+        self.lane = lane
+        self.waiter = None  # Future resolved with the slot, None until the call queues or gets one
+
+    @property
+    def granted(self):
+        return self.waiter is not None and self.waiter.done()
+
+
+class FairScheduler:
+    """Caps concurrent backend calls, serving users round-robin and interactive work ahead of bulk rows.
+
+    Prioritized bulk rows only go ahead of the same user's other bulk rows: users still take bulk turns
+    round-robin, so /priority cannot starve anyone else's spreadsheets. reserved slots
+    are kept for interactive calls so a long bulk run cannot make a text question wait for a free slot.
+    capacity, when given, returns how many calls the backend currently takes (its AIMD limit); the
+    slots shrink to it so calls held back by an overloaded backend still wait in priority order.
+    """
+
+    def __init__(self, concurrency=SCHEDULER_CONCURRENCY, interactive_weight=SCHEDULER_INTERACTIVE_WEIGHT,
+                 reserved=SCHEDULER_INTERACTIVE_RESERVED, initial_service_time=30.0, capacity=None):
+        self.max_concurrency = concurrency
+        self.capacity = capacity
+        self.interactive_weight = interactive_weight
+        self.reserved = max(0, reserved)
+        self.active = 0
+        self.service_time = {lane: initial_service_time for lane in LANES}  # EWMA of seconds per call, or per unit of size
+        self._lanes = {lane: OrderedDict() for lane in LANES}  # lane -> user_id -> deque of waiters
+        self._bulk_users = OrderedDict()  # Users with prioritized or bulk rows waiting, in round-robin order
+        self._interactive_streak = 0
+
+    def queued(self, lane=None):
+        """Return how many calls are waiting, in one lane or in total."""
+        lanes = [lane] if lane else LANES
+        return sum(len(queue) for name in lanes for queue in self._lanes[name].values())
+
+    @property
+    def concurrency(self):
+        """Return the current number of slots, at least one."""
+        if self.capacity is None:
+            return self.max_concurrency
+        return max(1, min(self.max_concurrency, self.capacity()))
+
+    def limit(self, lane):
+        """Return how many calls may be in flight before a call in lane has to wait."""
+        concurrency = self.concurrency
+        if lane == INTERACTIVE:
+            return concurrency
+        # Bulk keeps at least one slot
+        return concurrency - min(self.reserved, concurrency - 1)
+
+    def estimate(self, user_id, lane):
+        """Return (queue position, expected wait in seconds) for a call submitted now."""
+        if self.active < self.limit(lane) and not self.queued():
+            return 0, 0.0
+
+        # Round-robin serves every other user at most as many calls as this user has queued plus one
+        lanes = [INTERACTIVE] if lane == INTERACTIVE else [PRIORITY, BULK]
+        queues = {}
+        for name in lanes:
+            for other, queue in self._lanes[name].items():
+                queues[other] = queues.get(other, 0) + len(queue)
+        # This user's prioritized rows go first in any case
+        turns = len(self._lanes[lane].get(user_id, ())) + 1
+        if lane == BULK:
+            turns += len(self._lanes[PRIORITY].get(user_id, ()))
+        position = turns + sum(min(count, turns) for other, count in queues.items() if other != user_id)
+        if lane != INTERACTIVE:
+            position += self.queued(INTERACTIVE)
+        wait = -(-position // self.limit(lane)) * self.service_time[lane]
+        return position, wait
+
+    async def run(self, user_id, lane, func, *args, ticket=None, size=1):
+        """Wait for a slot, then await func(*args) while holding it.
+
+        Pass a Ticket(user_id, lane) to be able to promote the call while it waits. size is the work
+        the call carries, e.g. the questions of an uploaded file; service_time is kept per unit of it.
+        """
+        if ticket is None:
+            ticket = Ticket(user_id, lane)
+        with metrics.stage("queue_wait", lane=ticket.lane):
+            await self._acquire(ticket)
+        lane = ticket.lane
+        started = time.monotonic()
+        try:
+            result = await func(*args)
+            # Only completed calls: a fast failure or a timeout says nothing about how long an answer takes
+            seconds = (time.monotonic() - started) / max(1, size)
+            self.service_time[lane] = 0.8 * self.service_time[lane] + 0.2 * seconds
+            return result
+        finally:
+            self._release()
+
+    def promote(self, ticket, lane):
+        """Move a call that has no slot yet to lane if that is more urgent; True if it moved."""
+        if ticket.granted or LANES.index(lane) >= LANES.index(ticket.lane):
+            return False
+        if ticket.waiter is not None:
+            self._discard(ticket.lane, ticket.user_id, ticket.waiter)
+            self._enqueue(lane, ticket.user_id, ticket.waiter)
+        ticket.lane = lane
+        self._dispatch()
+        return True
+
+    async def _acquire(self, ticket):
+        if self.active < self.limit(ticket.lane) and not self.queued():
+            self.active += 1
+            ticket.waiter = asyncio.get_running_loop().create_future()
+            ticket.waiter.set_result(None)
+            return
+
+        waiter = ticket.waiter = asyncio.get_running_loop().create_future()
+        self._enqueue(ticket.lane, ticket.user_id, waiter)
+        # Waiting bulk rows do not hold back a call that may use a reserved slot
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we were cancelled, hand it on
+                self._release()
+            else:
+                self._discard(ticket.lane, ticket.user_id, waiter)
+            raise
+
+    def _enqueue(self, lane, user_id, waiter):
+        self._lanes[lane].setdefault(user_id, deque()).append(waiter)
+        if lane != INTERACTIVE:
+            self._bulk_users.setdefault(user_id)
+
+    def _discard(self, lane, user_id, waiter):
+        queue = self._lanes[lane].get(user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+        if not queue:
+            del self._lanes[lane][user_id]
+            self._forget_bulk_user(user_id)
+
+    def _forget_bulk_user(self, user_id):
+        if user_id not in self._lanes[PRIORITY] and user_id not in self._lanes[BULK]:
+            self._bulk_users.pop(user_id, None)
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to waiters."""
+        while True:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def _next_waiter(self):
+        interactive = self._lanes[INTERACTIVE] if self.active < self.limit(INTERACTIVE) else None
+        bulk = self._bulk_users if self.active < self.limit(BULK) else None
+        if interactive and (not bulk or self._interactive_streak < self.interactive_weight):
+            self._interactive_streak += 1
+            user_id, queue = next(iter(interactive.items()))
+            waiter = queue.popleft()
+            if queue:
+                interactive.move_to_end(user_id)
+            else:
+                del interactive[user_id]
+            return waiter
+        if not bulk:
+            return None
+
+        # The next user's turn, taken by their prioritized rows first
+        self._interactive_streak = 0
+        user_id = next(iter(bulk))
+        users = self._lanes[PRIORITY] if user_id in self._lanes[PRIORITY] else self._lanes[BULK]
+        queue = users[user_id]
+        waiter = queue.popleft()
+        if not queue:
+            del users[user_id]
+        bulk.move_to_end(user_id)
+        self._forget_bulk_user(user_id)
+        return waiter
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'concurrency': self.concurrency,
+            'reserved': self.reserved,
+            INTERACTIVE: self.queued(INTERACTIVE),
+            PRIORITY: self.queued(PRIORITY),
+            BULK: self.queued(BULK),
+            'service_time': self.service_time
+        }
@@ -0,0 +1,155 @@
+import re
+import time
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from answer_cache import normalize_question, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, SIMILARITY_THRESHOLD
+
+SIMILARITY_NUM_PERM = 64  # MinHash permutations
+SIMILARITY_BANDS = 16  # LSH bands, SIMILARITY_NUM_PERM / SIMILARITY_BANDS rows each
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from have how in is it of on or our the this to "
+    "what when where which who will with you your".split()
+)
+# Words that flip or narrow the meaning of a question; matches must agree on them
+_POLARITY = frozenset(
+    "not no never none nor neither without outside except excluding exclude non cannot unless instead "
+    "only but beyond".split()
+)
+_ABBREVIATIONS = {
+    "sso": "single sign on",
+    "mfa": "multi factor authentication",
+    "2fa": "two factor authentication",
+    "sla": "service level agreement",
+    "dpa": "data processing agreement",
+    "rbac": "role based access control",
+}
+
+
+def _stem(token):
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix) and not token.endswith("ss"):
+            token = token[:-len(suffix)]
+            break
+    return token[:-1] if len(token) > 4 and token.endswith("e") else token
+
+
+def shingles(text):
+    """Return the set of content words of a question, lightly stemmed with common acronyms spelled out."""
+    tokens = set()
+    for token in _TOKEN.findall(normalize_question(text)):
+        if token == "t":
+            token = "not"  # the tail of don't, isn't, ...
+        for word in _ABBREVIATIONS.get(token, token).split():
+            if word not in _STOPWORDS:
+                tokens.add(word if word in _POLARITY else _stem(word))
+    return frozenset(tokens)
+
+
+def _hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of answered questions for near-duplicate lookup.
+
+    Like AnswerCache it keeps at most max_size questions, dropping the least recently used, and
+    forgets answers older than ttl seconds.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=SIMILARITY_NUM_PERM, bands=SIMILARITY_BANDS,
+                 max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_size = max_size
+        self.ttl = ttl
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+        self._entries = OrderedDict()  # normalized question -> [question, answer, shingles, band keys, stored_at]
+        self._buckets = [{} for _ in range(bands)]  # band key -> set of normalized questions
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, stored_at):
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    def _signature(self, tokens):
+        hashes = np.fromiter((_hash(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+        # Universal hashing (a * h + b) mod p; uint64 wrap-around is intentional
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return (permuted & np.uint64(0xFFFFFFFF)).astype(np.uint32).min(axis=0)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, question, answer, stored_at=None):
+        """Index an answered question, replacing the answer if it is already known."""
+        stored_at = time.time() if stored_at is None else stored_at
+        key = normalize_question(question)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[1], entry[4] = answer, stored_at
+            self._entries.move_to_end(key)
+            return
+
+        tokens = shingles(question)
+        if not tokens or self._expired(stored_at):
+            return
+
+        band_keys = self._band_keys(self._signature(tokens))
+        self._entries[key] = [question, answer, tokens, band_keys, stored_at]
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, _, _, band_keys, _ = self._entries.pop(key)
+        for band, band_key in enumerate(band_keys):
+            bucket = self._buckets[band][band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band][band_key]
+
+    def lookup(self, question):
+        """Return (similar_question, answer, score) for the best match above threshold, or None."""
+        if self.threshold <= 0 or not self._entries:
+            return None
+
+        tokens = shingles(question)
+        if not tokens:
+            return None
+
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(self._signature(tokens))):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        polarity = tokens & _POLARITY
+        best_key, best_score = None, 0.0
+        for key in candidates:
+            entry = self._entries[key]
+            if self._expired(entry[4]):
+                self._remove(key)
+                continue
+            other = entry[2]
+            # "... in the EU?" must not answer "... outside the EU?", nor "encrypted?" answer "not encrypted?"
+            if other & _POLARITY != polarity:
+                continue
+            score = len(tokens & other) / len(tokens | other)
+            if score > best_score:
+                best_key, best_score = key, score
+
+        if best_key is None or best_score < self.threshold:
+            return None
+        self._entries.move_to_end(best_key)
+        question, answer = self._entries[best_key][:2]
+        return question, answer, best_score
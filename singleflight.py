@@ -0,0 +1,58 @@
+import asyncio
+
+
+class SingleFlight:
+    """Lets concurrent calls with the same key share one execution instead of repeating it.
+
+    The shared call runs in its own task: a caller that is cancelled stops waiting without cancelling
+    it for the others, and it is only cancelled, and forgotten, once every caller has gone. Its result or exception is
+    delivered to all callers and nothing is kept afterwards, so a failed call is retried by the next one.
+    A caller joining a shared call may adjust it through on_join, e.g. to raise its priority.
+    """
+
+    def __init__(self):
+        self.calls = 0  # Executions started
+        self.collapsed = 0  # Calls that joined an execution already in flight
+        self._flights = {}  # key -> [task, waiting callers, args of the shared call]
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def do(self, key, func, *args, on_join=None):
+        """Return await func(*args), sharing the execution with concurrent calls for key.
+
+        When joining a call already in flight, on_join is called with that call's args.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func(*args))
+            flight = self._flights[key] = [task, 0, args]
+            task.add_done_callback(lambda task: self._landed(key, task))
+        else:
+            self.collapsed += 1
+            if on_join is not None:
+                on_join(*flight[2])
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                # Every caller gave up, nobody needs the answer any more; a later caller starts afresh
+                # instead of joining a task that is being cancelled
+                task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def _landed(self, key, task):
+        if self._flights.get(key, [None])[0] is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Mark the exception retrieved, every caller may have left before it was raised
+            task.exception()
+
+    def stats(self):
+        return {'calls': self.calls, 'collapsed': self.collapsed, 'in_flight': len(self._flights)}
@@ -0,0 +1,190 @@
+import os
+import io
+import csv
+
+RFP_SHEET = 'rfp'
+QUESTION_COLUMN = 'question'
+ANSWER_COLUMN = 'answer'
+
+
+class SpreadsheetError(Exception):
+    """Raised with a user-facing message when an upload cannot be used."""
+
+
+class TooManyQuestionsError(SpreadsheetError):
+    """Raised as soon as an upload exceeds the question limit."""
+
+    def __init__(self, limit):
+        super().__init__(f"more than {limit} questions")
+        self.limit = limit
+
+    def __reduce__(self):
+        # Keep the limit when the error is raised in a worker process
+        return type(self), (self.limit,)
+
+
+def find_column(header, name):
+    """Return the index of the header cell matching name case-insensitively, or None."""
+    for index, cell in enumerate(header):
+        if cell is not None and str(cell).strip().lower() == name:
+            return index
+    return None
+
+
+def is_csv(filename):
+    return filename.lower().endswith('.csv')
+
+
+def _clean(value):
+    if value is None or not str(value).strip():
+        return None
+    return str(value).strip()
+
+
+def _iter_rows(path, filename):
+    """Yield the rows of the CSV file or of the 'rfp' sheet without loading the whole file."""
+    if is_csv(filename):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.reader(f)
+        return
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if RFP_SHEET not in workbook.sheetnames:
+            raise SpreadsheetError(f"Sheet '{RFP_SHEET}' not found. Found sheets: {', '.join(workbook.sheetnames)}")
+        yield from workbook[RFP_SHEET].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def scan_questions(path, filename, limit):
+    """Stream the question column and return one entry per data row, None for empty cells.
+
+    Reading stops as soon as more than limit questions have been seen.
+    """
+    rows = _iter_rows(path, filename)
+    try:
+        header = next(rows, None)
+        if header is None:
+            raise SpreadsheetError("Excel file is empty.")
+
+        column = find_column(header, QUESTION_COLUMN)
+        if column is None:
+            found = ', '.join(str(cell) for cell in header if cell is not None)
+            raise SpreadsheetError(
+                f"Excel file does not have '{QUESTION_COLUMN}' column.\n"
+                f"Please make sure your Excel file has a column named '{QUESTION_COLUMN}'.\n"
+                f"Found columns: {found}"
+            )
+
+        questions = []
+        count = 0
+        for row in rows:
+            question = _clean(row[column]) if column < len(row) else None
+            questions.append(question)
+            if question is not None:
+                count += 1
+                if count > limit:
+                    raise TooManyQuestionsError(limit)
+    finally:
+        rows.close()
+
+    # Trailing blank rows are formatting leftovers, not questions
+    while questions and questions[-1] is None:
+        questions.pop()
+    if not questions:
+        raise SpreadsheetError("Excel file is empty.")
+    return questions
+
+
+def iter_answered(path, filename):
+    """Yield (question, answer) for every row of a completed workbook that has both."""
+    rows = _iter_rows(path, filename)
+    try:
+        header = next(rows, None) or []
+        question_column = find_column(header, QUESTION_COLUMN)
+        answer_column = find_column(header, ANSWER_COLUMN)
+        if question_column is None or answer_column is None:
+            raise SpreadsheetError(f"Sheet '{RFP_SHEET}' needs '{QUESTION_COLUMN}' and '{ANSWER_COLUMN}' columns")
+        for row in rows:
+            question = _clean(row[question_column]) if question_column < len(row) else None
+            answer = _clean(row[answer_column]) if answer_column < len(row) else None
+            if question is not None and answer is not None:
+                yield question, answer
+    finally:
+        rows.close()
+
+
+def _with_answer(row, column, answer):
+    row = list(row)
+    if column >= len(row):
+        row.extend([None] * (column + 1 - len(row)))
+    row[column] = answer
+    return row
+
+
+def write_answers(path, filename, answers, out_path=None):
+    """Copy the upload, filling the answer column of the question rows.
+
+    Workbooks are edited in place so formulas, styles, column widths and merged cells survive; only the
+    answer cells of the 'rfp' sheet change. Writes the new file to out_path and returns out_path when
+    given, otherwise returns its bytes.
+    """
+    if is_csv(filename):
+        rows = _iter_rows(path, filename)
+        try:
+            header = list(next(rows, None) or [])
+            column = find_column(header, ANSWER_COLUMN)
+            if column is None:
+                column = len(header)
+            header = _with_answer(header, column, ANSWER_COLUMN)
+
+            def answered_rows():
+                yield header
+                for index, row in enumerate(rows):
+                    answer = answers[index] if index < len(answers) else None
+                    yield row if answer is None else _with_answer(row, column, answer)
+
+            if out_path:
+                with open(out_path, 'w', newline='', encoding='utf-8') as f:
+                    csv.writer(f).writerows(answered_rows())
+                return out_path
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(answered_rows())
+            return buffer.getvalue().encode('utf-8')
+        finally:
+            rows.close()
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, keep_vba=filename.lower().endswith('.xlsm'))
+    try:
+        if RFP_SHEET not in workbook.sheetnames:
+            raise SpreadsheetError(f"Sheet '{RFP_SHEET}' not found. Found sheets: {', '.join(workbook.sheetnames)}")
+        sheet = workbook[RFP_SHEET]
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        column = find_column(header, ANSWER_COLUMN)
+        if column is None:
+            column = len(header)
+            sheet.cell(row=1, column=column + 1, value=ANSWER_COLUMN)
+        for index, answer in enumerate(answers):
+            # Rows without a question keep whatever the upload had
+            if answer is not None:
+                sheet.cell(row=index + 2, column=column + 1, value=answer)
+
+        if out_path:
+            workbook.save(out_path)
+            return out_path
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return buffer.getvalue()
+    finally:
+        workbook.close()
+
+
+def remove_file(path):
+    """Delete a temporary upload, ignoring files that are already gone."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
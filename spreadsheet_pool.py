@@ -0,0 +1,85 @@
+import os
+import asyncio
+import logging
+import tempfile
+
+import spreadsheet
+
+SPREADSHEET_WORKERS = int(os.getenv("SPREADSHEET_WORKERS", str(min(4, os.cpu_count() or 1))))  # 0 parses in a thread instead
+# Start the workers with the bot instead of with the first upload
+SPREADSHEET_PREWARM = os.getenv("SPREADSHEET_PREWARM", "").lower() in ("1", "true", "yes")
+
+
+def _warm():
+    """Import the spreadsheet libraries once per worker so the first upload does not pay for it."""
+    import openpyxl  # noqa: F401
+
+
+def _ready():
+    return os.getpid()
+
+
+def temp_output(filename):
+    """Return the path of a new temporary file for the processed version of filename."""
+    fd, path = tempfile.mkstemp(prefix="rfp_out_", suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+    return path
+
+
+class SpreadsheetPool:
+    """Runs CPU-bound spreadsheet parsing and writing in worker processes so uploads do not stall the event loop.
+
+    Only file paths, questions and answers cross the process boundary; workbooks are read and written on disk.
+    """
+
+    def __init__(self, workers=SPREADSHEET_WORKERS):
+        self.workers = workers
+        self._executor = None  # Created with the first spreadsheet
+
+    @property
+    def executor(self):
+        if self._executor is None and self.workers > 0:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # Forking a process that already runs an event loop and threads is unsafe, start clean interpreters
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm
+            )
+        return self._executor
+
+    async def warm(self):
+        """Start the worker processes now rather than on the first upload."""
+        if self.executor is None:
+            return
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self.executor, _ready) for _ in range(self.workers)))
+        logging.info(f"Spreadsheet pool ready with {len(set(pids))} worker processes")
+
+    def queued(self):
+        """Return how many calls were submitted and have not finished yet."""
+        if self._executor is None:
+            return 0
+        return len(self._executor._pending_work_items)
+
+    async def _run(self, func, *args):
+        if self.executor is None:
+            return await asyncio.to_thread(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def scan_questions(self, path, filename, limit):
+        return await self._run(spreadsheet.scan_questions, path, filename, limit)
+
+    async def write_answers(self, path, filename, answers):
+        """Write the answered copy of the upload to a temporary file and return its path."""
+        out_path = temp_output(filename)
+        try:
+            return await self._run(spreadsheet.write_answers, path, filename, answers, out_path)
+        except BaseException:
+            spreadsheet.remove_file(out_path)
+            raise
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,47 @@
+import os
+import time
+import logging
+
+import metrics
+
+STARTED = time.perf_counter()
+_PHASES = {}  # phase -> seconds after STARTED
+
+
+def _process_age():
+    """Seconds since the interpreter started, read from /proc on Linux; None elsewhere."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Interpreter start-up and the imports before this module, e.g. uvicorn's
+BEFORE_IMPORT = _process_age()
+
+
+def mark(phase):
+    """Record that a startup phase has finished."""
+    _PHASES[phase] = time.perf_counter() - STARTED
+
+
+def phases():
+    """Return {phase: seconds since the process started} for the phases reached so far."""
+    offset = BEFORE_IMPORT or 0.0
+    timings = {'interpreter': offset} if BEFORE_IMPORT is not None else {}
+    timings.update((phase, offset + seconds) for phase, seconds in _PHASES.items())
+    return timings
+
+
+def report():
+    logging.info("Startup timings: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in phases().items()))
+
+
+STARTUP_SECONDS = metrics.Gauge(
+    "rfp_startup_seconds", "Seconds from process start until each startup phase finished",
+    lambda: {(('phase', phase),): seconds for phase, seconds in phases().items()}
+)
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import socket
+import secrets
+import logging
+import sqlite3
+
+from job_store import DATA_DIR, SQLITE_BUSY_TIMEOUT
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()  # "memory" for one process, "sqlite" to share state between workers
+STATE_PATH = os.getenv("STATE_PATH", os.path.join(DATA_DIR, "state.sqlite3"))  # Shared by all workers on the host
+STATE_PURGE_INTERVAL = 60  # Seconds between deletions of expired records
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    name TEXT NOT NULL,
+    member TEXT NOT NULL,
+    PRIMARY KEY (name, member)
+);
+CREATE TABLE IF NOT EXISTS records (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (name, key)
+);
+CREATE INDEX IF NOT EXISTS records_expires_at ON records (expires_at);
+"""
+
+
+def worker_id():
+    """Identify this process among the workers sharing the state.
+
+    The random suffix tells a restarted container apart from its previous run, which had the same
+    hostname and PID.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+
+class MemoryState:
+    """In-process state: only valid while the bot runs as a single process."""
+
+    shared = False
+    path = None
+
+    def __init__(self):
+        self._sets = {}
+
+    def members(self, name):
+        """Return the named set of user IDs."""
+        return self._sets.setdefault(name, set())
+
+    def close(self):
+        pass
+
+
+class SQLiteSet:
+    """Set of integer members stored in the shared state, with the subset of the set API the bot uses."""
+
+    def __init__(self, db, name):
+        self._db = db
+        self.name = name
+
+    def __contains__(self, member):
+        row = self._db.execute(
+            "SELECT 1 FROM members WHERE name = ? AND member = ?", (self.name, str(member))
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self):
+        rows = self._db.execute("SELECT member FROM members WHERE name = ?", (self.name,))
+        return iter([int(row[0]) for row in rows])
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM members WHERE name = ?", (self.name,)).fetchone()[0]
+
+    def add(self, member):
+        self._db.execute("INSERT OR IGNORE INTO members (name, member) VALUES (?, ?)", (self.name, str(member)))
+
+    def discard(self, member):
+        self._db.execute("DELETE FROM members WHERE name = ? AND member = ?", (self.name, str(member)))
+
+
+class SQLiteState:
+    """State shared by every worker process on the host through one SQLite database in WAL mode."""
+
+    shared = True
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._purged = 0.0
+        self._purge()
+        logging.info(f"Shared state opened at {path}")
+
+    def members(self, name):
+        return SQLiteSet(self._db, name)
+
+    def _purge(self):
+        now = time.time()
+        if now - self._purged >= STATE_PURGE_INTERVAL:
+            self._purged = now
+            self._db.execute("DELETE FROM records WHERE expires_at < ?", (now,))
+
+    def put(self, name, key, value, ttl=None):
+        """Store a JSON-serializable value under name/key, dropped ttl seconds from now if given."""
+        # Expired records are skipped by reads but only deleted here, keep the table from growing
+        self._purge()
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._db.execute(
+            "INSERT OR REPLACE INTO records (name, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (name, str(key), json.dumps(value), expires_at)
+        )
+
+    def get(self, name, key):
+        row = self._db.execute(
+            "SELECT value FROM records WHERE name = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (name, str(key), time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def scan(self, name, prefix=""):
+        """Yield (key, value) of the live records under name whose key starts with prefix."""
+        rows = self._db.execute(
+            "SELECT key, value FROM records WHERE name = ? AND key >= ? AND key < ? "
+            "AND (expires_at IS NULL OR expires_at > ?) ORDER BY key",
+            (name, prefix, prefix + "\uffff", time.time())
+        )
+        for key, value in rows:
+            yield key, json.loads(value)
+
+    def close(self):
+        self._db.close()
+
+
+def open_state(backend=STATE_BACKEND):
+    """Return the state backend selected by STATE_BACKEND."""
+    if backend == "sqlite":
+        return SQLiteState()
+    if backend != "memory":
+        raise ValueError(f"Unknown STATE_BACKEND: {backend}")
+    return MemoryState()
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_normalized_question_hits():
+    cache = AnswerCache(path="")
+    cache.set("Do you support  SSO?", "Yes")
+
+    assert cache.get("  do you SUPPORT sso?\n") == "Yes"
+    assert cache.get("Do you support SAML?") is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache = AnswerCache(max_size=2, path="")
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl=60, path="")
+    cache.set("a", "1")
+
+    clock[0] += 59
+    assert cache.get("a") == "1"
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disk_keeps_newest_live_rows(tmp_path, clock):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(ttl=60, path=path, disk_size=3)
+    for question in "abcde":
+        cache.set(question, question.upper())
+        clock[0] += 10
+    cache.close()
+
+    # Reopening prunes: "a" expired, then only the 3 newest of the rest stay
+    clock[0] += 15
+    cache = AnswerCache(ttl=60, path=path, disk_size=3)
+    assert [question for question, _, _ in cache.items()] == ["c", "d", "e"]
+    assert cache._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 3
+    # Read through from disk into an empty memory tier
+    assert cache.get("d") == "D"
+    cache.close()
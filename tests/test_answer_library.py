@@ -0,0 +1,37 @@
+import os
+import csv
+
+from answer_library import AnswerLibrary, import_workbooks
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows([("question", "answer"), *rows])
+
+
+def test_reimport_keeps_newest_answer_and_skips_unchanged_files(tmp_path):
+    library_dir = str(tmp_path / "library")
+    first = tmp_path / "a.csv"
+    second = tmp_path / "b.csv"
+    _write_csv(first, [("Do you support SSO?", "Yes"), ("Is data encrypted at rest?", "AES-256")])
+    _write_csv(second, [("do you support  sso?", "Yes, via SAML"), ("What is your uptime SLA?", "99.9%")])
+
+    report = import_workbooks([str(tmp_path)], library_dir, jobs=1)
+    assert (report['files'], report['skipped'], report['answers']) == (2, 0, 3)
+
+    library = AnswerLibrary(library_dir, reload_interval=0)
+    # Of two files in one import the later one wins
+    assert library.get("Do you support SSO?") == "Yes, via SAML"
+    assert library.get("Is data encrypted at rest?") == "AES-256"
+
+    _write_csv(first, [("Do you support SSO?", "Yes, via SAML and OIDC"), ("Is data encrypted at rest?", "AES-256")])
+    stat = os.stat(first)
+    os.utime(first, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    report = import_workbooks([str(tmp_path)], library_dir, jobs=1)
+    assert (report['files'], report['skipped'], report['rows'], report['answers']) == (1, 1, 2, 3)
+
+    # The open library picks up the rebuilt index
+    assert library.get("do you support sso?") == "Yes, via SAML and OIDC"
+    assert library.get("What is your uptime SLA?") == "99.9%"
+    assert len(library) == 3
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientConnectionError
+
+from api_client import RFPApiError
+from backend_router import BackendRouter
+from backpressure import CircuitBreaker
+
+
+class _Response:
+    status = 200
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Session:
+    def get(self, url, **kwargs):
+        return _Response()
+
+
+class _Client:
+    """Stands in for RFPApiClient: every call runs the coroutine function given as behaviour."""
+
+    def __init__(self, name, behaviour):
+        self.base_url = f"http://{name}"
+        self.name = name
+        self.behaviour = behaviour
+        self.breaker = CircuitBreaker()
+        self.session = _Session()
+        self.encoding = None
+        self.calls = []
+        self.cancelled = False
+
+    async def _run(self, method, *args):
+        self.calls.append(method)
+        try:
+            return await self.behaviour(self, *args)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    async def ask(self, question):
+        return await self._run('ask', question)
+
+    async def process_excel(self, source, filename):
+        return await self._run('process_excel', source, filename)
+
+    async def close(self):
+        pass
+
+
+def _answer(seconds=0.0):
+    async def behaviour(client, *args):
+        await asyncio.sleep(seconds)
+        return client.name
+    return behaviour
+
+
+def _fail(error):
+    async def behaviour(client, *args):
+        raise error
+    return behaviour
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _call(router, method, *args):
+    try:
+        return await getattr(router, method)(*args)
+    finally:
+        await router.close()
+
+
+def test_slow_question_is_hedged_and_the_loser_cancelled():
+    slow = _Client("slow", _answer(5))
+    fast = _Client("fast", _answer())
+    router = BackendRouter([slow, fast], hedge=True, health_interval=3600)
+    router.latencies.extend([0.01] * 20)
+
+    answer = _run(_call(router, 'ask', "Do you support SSO?"))
+
+    assert answer == "fast"
+    assert slow.cancelled
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+
+
+@pytest.mark.parametrize("error", [RFPApiError(503), ClientConnectionError("reset")])
+def test_unavailable_backend_fails_over(error):
+    down = _Client("down", _fail(error))
+    up = _Client("up", _answer())
+    router = BackendRouter([down, up], health_interval=3600)
+
+    assert _run(_call(router, 'ask', "Do you support SSO?")) == "up"
+    assert down.calls == ['ask'] and up.calls == ['ask']
+    assert not router.backends[0].healthy
+
+
+@pytest.mark.parametrize("error", [RFPApiError(502), asyncio.TimeoutError()])
+def test_upload_does_not_fail_over_once_the_backend_may_have_started(error):
+    first = _Client("first", _fail(error))
+    second = _Client("second", _answer())
+    router = BackendRouter([first, second], health_interval=3600)
+
+    with pytest.raises(type(error)):
+        _run(_call(router, 'process_excel', "rfp.xlsx", "rfp.xlsx"))
+    assert second.calls == []
+
+
+def test_upload_turned_away_with_retry_after_fails_over():
+    busy = _Client("busy", _fail(RFPApiError(503, retry_after=5.0)))
+    idle = _Client("idle", _answer())
+    router = BackendRouter([busy, idle], health_interval=3600)
+
+    assert _run(_call(router, 'process_excel', "rfp.xlsx", "rfp.xlsx")) == "idle"
+
+
+def test_rejected_request_is_not_retried_elsewhere():
+    rejecting = _Client("rejecting", _fail(RFPApiError(400, "bad question")))
+    other = _Client("other", _answer())
+    router = BackendRouter([rejecting, other], health_interval=3600)
+
+    with pytest.raises(RFPApiError) as raised:
+        _run(_call(router, 'ask', "?"))
+    assert raised.value.status == 400
+    assert other.calls == []
+    assert router.backends[0].healthy
+
+
+def test_cheapest_backend_is_picked():
+    busy = _Client("busy", _answer())
+    quick = _Client("quick", _answer())
+    router = BackendRouter([busy, quick], health_interval=3600)
+    router.backends[0].latency, router.backends[0].outstanding = 1.0, 3
+    router.backends[1].latency = 2.0
+
+    # 1.0 s x 4 queued calls costs more than 2.0 s x 1
+    assert router.pick() is router.backends[1]
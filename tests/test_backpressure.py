@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from api_client import RFPApiClient
+from backpressure import AIMDLimiter, CircuitBreaker, CircuitOpenError
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.check()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_breaker_half_opens_then_closes_or_reopens(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    now[0] += 30
+    assert breaker.state == 'half-open'
+    breaker.check()
+
+    # A failed probe opens the circuit for another full timeout
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    now[0] += 29
+    assert breaker.state == 'open'
+
+    now[0] += 1
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_limiter_halves_on_failure_and_grows_on_success():
+    limiter = AIMDLimiter(initial=8, minimum=1, maximum=10)
+    limiter.record(0.1, ok=False)
+    assert limiter.limit == 4
+    limiter.record(0.1, ok=True)
+    assert limiter.limit > 4
+    for _ in range(1000):
+        limiter.record(0.1, ok=True)
+    assert limiter.limit == 10
+
+
+def test_limiter_treats_latency_spikes_as_overload():
+    limiter = AIMDLimiter(initial=10, minimum=1, maximum=10, latency_tolerance=2.0)
+    limiter.record(1.0, ok=True)
+    limiter.record(5.0, ok=True)
+    assert limiter.limit == 5
+
+
+def test_endpoints_keep_separate_limits():
+    client = RFPApiClient("http://backend", "token", pool_per_host=20)
+    client.limiters["text"].record(1.0, ok=True)
+    client.limiters["excel"].record(120.0, ok=True)
+    assert client.limiters["text"].limit >= 19
+    assert client.limiters["text"].baseline == 1.0
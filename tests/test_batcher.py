@@ -0,0 +1,53 @@
+import asyncio
+
+from batcher import MicroBatcher
+from scheduler import FairScheduler, Ticket, INTERACTIVE, BULK
+
+
+class _Backend:
+    def __init__(self):
+        self.batches = []
+
+    async def ask_batch(self, questions):
+        self.batches.append(list(questions))
+        await asyncio.sleep(0.01)
+        return [question.upper() for question in questions]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_batch_is_not_capped_by_scheduler_slots():
+    async def main():
+        backend = _Backend()
+        scheduler = FairScheduler(concurrency=2, reserved=0)
+        batcher = MicroBatcher(backend, window=0.01, max_size=16, scheduler=scheduler)
+        answers = await asyncio.gather(*(batcher.ask(f"q{i}", Ticket(i, BULK)) for i in range(10)))
+        return answers, backend.batches
+
+    answers, batches = _run(main())
+    assert answers == [f"Q{i}" for i in range(10)]
+    assert [len(batch) for batch in batches] == [10]
+
+
+def test_batch_takes_the_most_urgent_lane_of_its_questions():
+    async def main():
+        backend = _Backend()
+        lanes = []
+        scheduler = FairScheduler(concurrency=1, reserved=0)
+        run = scheduler.run
+
+        async def recording_run(user_id, lane, func, *args, **kwargs):
+            lanes.append((user_id, lane))
+            return await run(user_id, lane, func, *args, **kwargs)
+
+        scheduler.run = recording_run
+        batcher = MicroBatcher(backend, window=0.01, scheduler=scheduler)
+        await asyncio.gather(
+            batcher.ask("row", Ticket(1, BULK)),
+            batcher.ask("text", Ticket(2, INTERACTIVE))
+        )
+        return lanes
+
+    assert _run(main()) == [(2, INTERACTIVE)]
@@ -0,0 +1,100 @@
+import os
+
+from job_store import JobStore
+
+
+def test_priority_only_reorders_the_users_own_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "files"))
+    job_ids = []
+    for message_id, user_id in enumerate([1, 2, 1, 1, 2]):
+        upload = tmp_path / f"upload{message_id}.xlsx"
+        upload.write_bytes(b"")
+        job_ids.append(store.create(user_id, user_id, message_id, "rfp.xlsx", str(upload), "bulk", ["q"])['job_id'])
+
+    assert store.prioritize(job_ids[3])
+    claimed = [job['job_id'] for job in store.claim("worker", limit=3)]
+
+    # User 1's prioritized job takes that user's first place, user 2 keeps theirs
+    assert claimed == [job_ids[3], job_ids[1], job_ids[0]]
+    store.close()
+
+
+def test_claim_skips_while_another_worker_holds_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr("job_store.SQLITE_BUSY_TIMEOUT", 0.05)
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path, str(tmp_path / "files"))
+    upload = tmp_path / "upload.xlsx"
+    upload.write_bytes(b"")
+    job_id = store.create(1, 1, 1, "rfp.xlsx", str(upload), "bulk", ["q"])['job_id']
+
+    other = JobStore(path, str(tmp_path / "files"))
+    other._db.execute("BEGIN IMMEDIATE")
+    assert store.claim("worker") == []
+
+    other._db.execute("COMMIT")
+    assert [job['job_id'] for job in store.claim("worker")] == [job_id]
+    other.close()
+    store.close()
+
+
+def _create(store, tmp_path, questions=("q",), user_id=1, message_id=1):
+    upload = tmp_path / f"upload{message_id}.xlsx"
+    upload.write_bytes(b"")
+    return store.create(user_id, user_id, message_id, "rfp.xlsx", str(upload), "fanout", list(questions))
+
+
+def test_takeover_resumes_from_checkpoints(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path, str(tmp_path / "files"))
+    job = _create(store, tmp_path, ["q1", None, "q3", "q4"])
+    assert [claimed['job_id'] for claimed in store.claim("crashed")] == [job['job_id']]
+    store.set_status(job['job_id'], 'running')
+    store.record_answers(job['job_id'], [(0, "a1"), (3, "a4")])
+    store.close()
+
+    # A restarted single process takes over its own unexpired lease
+    store = JobStore(path, str(tmp_path / "files"))
+    assert store.claim("restarted") == []
+    claimed = store.claim("restarted", takeover=True)
+    assert [(c['job_id'], c['status'], c['owner']) for c in claimed] == [(job['job_id'], 'running', 'restarted')]
+    assert store.questions(job['job_id']) == ["q1", None, "q3", "q4"]
+    assert store.answers(job['job_id']) == {0: "a1", 3: "a4"}
+    store.close()
+
+
+def test_finish_drops_checkpoints_and_upload(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "files"))
+    job = _create(store, tmp_path, ["q1", "q2"])
+    store.record_answers(job['job_id'], [(0, "a1")])
+    assert os.path.exists(job['path'])
+
+    store.finish(job['job_id'], 'completed')
+
+    assert store.get(job['job_id'])['status'] == 'completed'
+    assert store.questions(job['job_id']) == []
+    assert store.answers(job['job_id']) == {}
+    assert not os.path.exists(job['path'])
+    store.close()
+
+
+def test_set_status_keeps_a_pending_cancellation(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "files"))
+    job = _create(store, tmp_path)
+    assert store.request_cancel(job['job_id'])['status'] == 'cancelling'
+
+    store.set_status(job['job_id'], 'running')
+
+    assert store.get(job['job_id'])['status'] == 'cancelling'
+    store.close()
+
+
+def test_released_jobs_are_claimed_by_another_worker(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "files"))
+    job = _create(store, tmp_path)
+    assert len(store.claim("first")) == 1
+    assert store.claim("second") == []
+
+    store.release("first")
+
+    assert [(c['job_id'], c['owner']) for c in store.claim("second")] == [(job['job_id'], "second")]
+    store.close()
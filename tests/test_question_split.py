@@ -0,0 +1,27 @@
+from question_split import split_questions, chunk_text
+
+
+def test_numbered_list_is_split_into_items():
+    assert split_questions("1. Do you encrypt data at rest?\n2. Do you support SSO?") == [
+        "Do you encrypt data at rest?", "Do you support SSO?"
+    ]
+
+
+def test_lead_in_is_kept_with_every_item():
+    assert split_questions("Which IdPs do you support:\n- SAML\n- OIDC") == [
+        "Which IdPs do you support: SAML", "Which IdPs do you support: OIDC"
+    ]
+    assert split_questions("Describe your DR plan, including:\na) RTO\nb) RPO") == [
+        "Describe your DR plan, including: RTO", "Describe your DR plan, including: RPO"
+    ]
+
+
+def test_single_question_is_left_alone():
+    assert split_questions("  Do you support SSO?\n") == ["Do you support SSO?"]
+    assert split_questions("Which IdPs:\n- SAML") == ["Which IdPs:\n- SAML"]
+
+
+def test_chunks_fit_the_limit():
+    chunks = chunk_text("line\n" * 100, limit=42)
+    assert all(len(chunk) <= 42 for chunk in chunks)
+    assert "".join(chunks).count("line") == 100
@@ -0,0 +1,266 @@
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, Ticket, INTERACTIVE, PRIORITY, BULK
+
+
+async def _hold(scheduler, user_id, lane, order, tag, release):
+    async def call():
+        order.append(tag)
+        await release.wait()
+    await scheduler.run(user_id, lane, call)
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_users_are_served_round_robin():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0)
+        order = []
+        release = asyncio.Event()
+        release.set()
+        blocker = asyncio.Event()
+        first = asyncio.create_task(_hold(scheduler, 0, BULK, order, "first", blocker))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(_hold(scheduler, 1, BULK, order, f"a{i}", release)) for i in range(3)]
+        tasks += [asyncio.create_task(_hold(scheduler, 2, BULK, order, f"b{i}", release)) for i in range(3)]
+        await asyncio.sleep(0)
+        blocker.set()
+        await asyncio.gather(first, *tasks)
+        return order
+
+    assert _run(main()) == ["first", "a0", "b0", "a1", "b1", "a2", "b2"]
+
+
+def test_interactive_first_and_priority_only_within_the_users_own_rows():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0)
+        order = []
+        release = asyncio.Event()
+        release.set()
+        blocker = asyncio.Event()
+        first = asyncio.create_task(_hold(scheduler, 0, BULK, order, "first", blocker))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(_hold(scheduler, 1, BULK, order, "bulk", release)),
+            asyncio.create_task(_hold(scheduler, 2, BULK, order, "other", release)),
+            asyncio.create_task(_hold(scheduler, 1, PRIORITY, order, "priority", release)),
+            asyncio.create_task(_hold(scheduler, 3, INTERACTIVE, order, "interactive", release)),
+        ]
+        await asyncio.sleep(0)
+        blocker.set()
+        await asyncio.gather(first, *tasks)
+        return order
+
+    assert _run(main()) == ["first", "interactive", "priority", "other", "bulk"]
+
+
+def test_prioritized_rows_do_not_starve_other_users():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0)
+        order = []
+        release = asyncio.Event()
+        release.set()
+        blocker = asyncio.Event()
+        first = asyncio.create_task(_hold(scheduler, 0, BULK, order, "first", blocker))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(_hold(scheduler, 1, PRIORITY, order, f"p{i}", release)) for i in range(3)]
+        tasks += [asyncio.create_task(_hold(scheduler, 2, BULK, order, f"b{i}", release)) for i in range(2)]
+        await asyncio.sleep(0)
+        blocker.set()
+        await asyncio.gather(first, *tasks)
+        return order, scheduler
+
+    order, scheduler = _run(main())
+    assert order == ["first", "p0", "b0", "p1", "b1", "p2"]
+    assert not scheduler._bulk_users
+
+
+def test_reserved_slots_stay_free_for_interactive_calls():
+    async def main():
+        scheduler = FairScheduler(concurrency=3, reserved=1)
+        order = []
+        release = asyncio.Event()
+        bulk = [asyncio.create_task(_hold(scheduler, 1, BULK, order, f"bulk{i}", release)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert order == ["bulk0", "bulk1"]
+        assert scheduler.queued(BULK) == 1
+
+        interactive = asyncio.create_task(_hold(scheduler, 2, INTERACTIVE, order, "interactive", release))
+        await asyncio.sleep(0.01)
+        assert order == ["bulk0", "bulk1", "interactive"]
+        release.set()
+        await asyncio.gather(*bulk, interactive)
+        return scheduler
+
+    scheduler = _run(main())
+    assert scheduler.active == 0
+    assert scheduler.queued() == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0)
+        order = []
+        release = asyncio.Event()
+        first = asyncio.create_task(_hold(scheduler, 1, BULK, order, "first", release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_hold(scheduler, 2, BULK, order, "cancelled", release))
+        await asyncio.sleep(0)
+        assert scheduler.queued() == 1
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert scheduler.queued() == 0
+        release.set()
+        await first
+        return order, scheduler
+
+    order, scheduler = _run(main())
+    assert order == ["first"]
+    assert scheduler.active == 0
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_handed_on():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0)
+        order = []
+        release = asyncio.Event()
+        release.set()
+        await scheduler._acquire(Ticket(1, BULK))
+        granted = asyncio.create_task(_hold(scheduler, 2, BULK, order, "granted", release))
+        nxt = asyncio.create_task(_hold(scheduler, 3, BULK, order, "next", release))
+        await asyncio.sleep(0)
+
+        # Free the slot and cancel its new owner before it gets to run
+        scheduler._release()
+        granted.cancel()
+        await asyncio.gather(granted, nxt, return_exceptions=True)
+        return order, scheduler
+
+    order, scheduler = _run(main())
+    assert order == ["next"]
+    assert scheduler.active == 0
+
+
+def test_service_time_is_tracked_per_lane():
+    async def main():
+        scheduler = FairScheduler(concurrency=2, reserved=0, initial_service_time=1.0)
+
+        async def slow():
+            await asyncio.sleep(0.05)
+        async def fast():
+            return None
+        await scheduler.run(1, BULK, slow)
+        await scheduler.run(1, INTERACTIVE, fast)
+        return scheduler
+
+    scheduler = _run(main())
+    assert scheduler.service_time[INTERACTIVE] < scheduler.service_time[BULK]
+    assert scheduler.service_time[PRIORITY] == 1.0
+
+
+def test_promoted_call_leaves_its_lane():
+    async def main():
+        scheduler = FairScheduler(concurrency=2, reserved=1)
+        order = []
+        blocker = asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, 0, BULK, order, "bulk0", blocker))]
+        await asyncio.sleep(0)
+
+        # Bulk may only use one slot, this row waits behind the first one
+        ticket = Ticket(1, BULK)
+        tasks.append(asyncio.create_task(scheduler.run(1, BULK, _record, order, "promoted", ticket=ticket)))
+        await asyncio.sleep(0)
+        waited = order[:]
+
+        # Interactive calls may take the reserved slot, so it runs while the first row still holds its one
+        promoted = scheduler.promote(ticket, INTERACTIVE)
+        again = scheduler.promote(ticket, PRIORITY)
+        await tasks[1]
+        served = order[:]
+        blocker.set()
+        await tasks[0]
+        return waited, served, promoted, again, scheduler
+
+    waited, served, promoted, again, scheduler = _run(main())
+    assert waited == ["bulk0"]
+    assert served == ["bulk0", "promoted"]
+    assert promoted and not again
+    assert scheduler.active == 0
+    assert scheduler.queued() == 0
+
+
+def test_running_call_is_not_promoted():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0)
+        ticket = Ticket(1, BULK)
+        await scheduler._acquire(ticket)
+        promoted = scheduler.promote(ticket, INTERACTIVE)
+        scheduler._release()
+        return promoted, ticket.lane
+
+    assert _run(main()) == (False, BULK)
+
+
+async def _record(order, tag):
+    order.append(tag)
+
+
+def test_shrinking_capacity_keeps_interactive_calls_first():
+    async def main():
+        capacity = [3]
+        scheduler = FairScheduler(concurrency=3, reserved=0, capacity=lambda: capacity[0])
+        order = []
+        release = asyncio.Event()
+        release.set()
+        blocker = asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, 0, BULK, order, f"held{i}", blocker)) for i in range(3)]
+        await asyncio.sleep(0)
+
+        # The backend backs off while the rows hold every slot
+        capacity[0] = 1
+        tasks += [asyncio.create_task(_hold(scheduler, 1, BULK, order, f"bulk{i}", release)) for i in range(2)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(_hold(scheduler, 2, INTERACTIVE, order, "text", release)))
+        await asyncio.sleep(0)
+        blocker.set()
+        await asyncio.gather(*tasks)
+        return order, scheduler.limit(BULK)
+
+    order, bulk_limit = _run(main())
+    assert order == ["held0", "held1", "held2", "text", "bulk0", "bulk1"]
+    assert bulk_limit == 1
+
+
+def test_service_time_is_kept_per_unit_of_size():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0, initial_service_time=1.0)
+
+        async def upload():
+            await asyncio.sleep(0.05)
+
+        await scheduler.run(1, BULK, upload, size=50)
+        return scheduler.service_time[BULK]
+
+    # 0.8 * 1.0 + 0.2 * (0.05 s / 50 questions)
+    assert 0.8 < _run(main()) < 0.81
+
+
+def test_failed_calls_do_not_change_service_time():
+    async def main():
+        scheduler = FairScheduler(concurrency=1, reserved=0, initial_service_time=1.0)
+
+        async def fail():
+            raise RuntimeError("backend down")
+
+        with pytest.raises(RuntimeError):
+            await scheduler.run(1, BULK, fail)
+        service_time = scheduler.service_time[BULK]
+        # The slot is released all the same
+        await asyncio.wait_for(scheduler.run(1, BULK, asyncio.sleep, 0), 1)
+        return service_time
+
+    assert _run(main()) == 1.0
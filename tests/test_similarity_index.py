@@ -0,0 +1,56 @@
+import time
+
+from similarity_index import SimilarityIndex
+
+
+def _index(**kwargs):
+    kwargs.setdefault('threshold', 0.8)
+    return SimilarityIndex(**kwargs)
+
+
+def test_reuse_is_off_by_default():
+    index = SimilarityIndex()
+    index.add("Do you support SSO?", "Yes.")
+    assert index.lookup("Do you support SSO?") is None
+
+
+def test_paraphrase_with_acronym_is_reused():
+    index = _index()
+    index.add("Do you support SSO?", "Yes, via SAML.")
+    match = index.lookup("Is single sign-on supported?")
+    assert match is not None
+    assert match[:2] == ("Do you support SSO?", "Yes, via SAML.")
+
+
+def test_negation_and_contrast_block_a_match():
+    index = _index()
+    index.add("Do you store customer data in the EU?", "Yes, in Frankfurt.")
+    index.add("Is customer data encrypted at rest?", "Yes, AES-256.")
+
+    assert index.lookup("Do you store customer data outside the EU?") is None
+    assert index.lookup("Is customer data not encrypted at rest?") is None
+    assert index.lookup("Isn't customer data encrypted at rest?") is None
+    assert index.lookup("Is customer data encrypted at rest?")[1] == "Yes, AES-256."
+
+
+def test_index_keeps_the_most_recently_used_questions():
+    index = _index(max_size=2)
+    index.add("Do you support SSO?", "sso")
+    index.add("Is customer data encrypted at rest?", "encryption")
+    assert index.lookup("Do you support SSO?") is not None
+    index.add("Do you offer a service level agreement?", "sla")
+
+    assert len(index) == 2
+    assert index.lookup("Is customer data encrypted at rest?") is None
+    assert index.lookup("Do you support SSO?")[1] == "sso"
+
+
+def test_expired_answers_are_not_reused():
+    index = _index(ttl=60)
+    index.add("Do you support SSO?", "old", stored_at=time.time() - 120)
+    index.add("Is customer data encrypted at rest?", "stale", stored_at=time.time() - 30)
+    assert len(index) == 1
+
+    index._entries[next(iter(index._entries))][4] -= 60
+    assert index.lookup("Is customer data encrypted at rest?") is None
+    assert len(index) == 0
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        results = await asyncio.gather(*(flight.do("key", work, 21) for _ in range(5)))
+        return results, calls, flight
+
+    results, calls, flight = _run(main())
+    assert results == [42] * 5
+    assert calls == [21]
+    assert flight.stats() == {'calls': 1, 'collapsed': 4, 'in_flight': 0}
+
+
+def test_error_reaches_every_caller_and_is_not_kept():
+    async def main():
+        flight = SingleFlight()
+        attempts = []
+
+        async def work():
+            attempts.append(None)
+            await asyncio.sleep(0.01)
+            raise ValueError("backend down")
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(ValueError):
+            await flight.do("key", work)
+        return results, attempts
+
+    results, attempts = _run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    # The failure was shared, then retried by the next call
+    assert len(attempts) == 2
+
+
+def test_shared_call_is_cancelled_only_after_the_last_caller_leaves():
+    async def main():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await started.wait()
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        still_running = not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        return still_running, len(flight)
+
+    still_running, in_flight = _run(main())
+    assert still_running
+    assert in_flight == 0
+
+
+def test_joining_caller_sees_the_shared_call_args():
+    async def main():
+        flight = SingleFlight()
+        joined = []
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("key", work, "first", on_join=joined.append),
+            flight.do("key", work, "second", on_join=joined.append)
+        )
+        return results, joined
+
+    results, joined = _run(main())
+    assert results == ["first", "first"]
+    assert joined == ["first"]
+
+
+def test_caller_arriving_after_the_last_one_left_starts_a_new_call():
+    async def main():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            started.set()
+            try:
+                await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+            except asyncio.CancelledError:
+                # Cleanup keeps the cancelled call alive for a moment
+                await asyncio.sleep(0.01)
+                raise
+            return value
+
+        first = asyncio.create_task(flight.do("key", work, "first"))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        late = await flight.do("key", work, "late")
+        await asyncio.gather(first, return_exceptions=True)
+        return late, calls, len(flight)
+
+    late, calls, in_flight = _run(main())
+    assert late == "late"
+    assert calls == ["first", "late"]
+    assert in_flight == 0
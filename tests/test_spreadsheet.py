@@ -0,0 +1,51 @@
+import openpyxl
+from openpyxl.styles import Font
+
+import spreadsheet
+
+
+def _workbook(path):
+    workbook = openpyxl.Workbook()
+    rfp = workbook.active
+    rfp.title = spreadsheet.RFP_SHEET
+    rfp.append(["question", "answer", "owner"])
+    rfp.append(["Do you support SSO?", None, "alice"])
+    rfp.append([None, "kept", None])
+    rfp.append(["Is data encrypted at rest?", None, "bob"])
+    rfp["A1"].font = Font(bold=True)
+    rfp.column_dimensions["A"].width = 60
+
+    notes = workbook.create_sheet("notes")
+    notes.append([1, 2, "=A1+B1"])
+    notes["A1"].font = Font(bold=True)
+    notes.merge_cells("A3:C3")
+    workbook.save(path)
+
+
+def test_write_answers_only_changes_answer_cells(tmp_path):
+    source = tmp_path / "upload.xlsx"
+    out = tmp_path / "answered.xlsx"
+    _workbook(source)
+
+    spreadsheet.write_answers(str(source), "upload.xlsx", ["Yes.", None, "AES-256."], str(out))
+
+    workbook = openpyxl.load_workbook(out)
+    rfp = workbook[spreadsheet.RFP_SHEET]
+    assert [row[1] for row in rfp.iter_rows(values_only=True)] == ["answer", "Yes.", "kept", "AES-256."]
+    assert rfp["C2"].value == "alice"
+    assert rfp["A1"].font.bold
+    assert rfp.column_dimensions["A"].width == 60
+
+    notes = workbook["notes"]
+    assert notes["C1"].value == "=A1+B1"
+    assert notes["A1"].font.bold
+    assert "A3:C3" in {str(cells) for cells in notes.merged_cells.ranges}
+
+
+def test_write_answers_adds_a_missing_answer_column(tmp_path):
+    source = tmp_path / "upload.csv"
+    source.write_text("question\nDo you support SSO?\n\nIs data encrypted?\n", encoding="utf-8")
+
+    data = spreadsheet.write_answers(str(source), "upload.csv", ["Yes.", None, "No."])
+
+    assert data.decode("utf-8").splitlines() == ["question,answer", "Do you support SSO?,Yes.", "", "Is data encrypted?,No."]
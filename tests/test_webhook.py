@@ -0,0 +1,61 @@
+import sys
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fake_telegram import Recorder, FakeApplication
+
+SECRET = "harness-secret"
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 7,
+        "date": 0,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Harness"},
+        "text": "Do you support SSO?"
+    }
+}
+
+
+@pytest.fixture
+def webhook_app(tmp_path, monkeypatch):
+    """Import app.py in webhook mode with a known secret and no registration with Telegram."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("WEBHOOK_URL", "http://localhost:7860")
+    monkeypatch.setenv("WEBHOOK_REGISTER", "0")
+    monkeypatch.setenv("WEBHOOK_SECRET", SECRET)
+    # Both modules read their settings at import time
+    for name in ("app", "bot_telegram"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    import app
+    return app
+
+
+def test_local_harness_can_post_updates(webhook_app):
+    import bot_telegram
+
+    async def main():
+        application = FakeApplication(Recorder())
+        bot = bot_telegram.TelegramBot("0:test", "http://backend.invalid", application=application)
+        webhook_app.bot = bot
+        await bot.run(webhook_url="http://localhost:7860/telegram/webhook", register_webhook=False)
+        try:
+            transport = httpx.ASGITransport(app=webhook_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+                rejected = await client.post(
+                    bot_telegram.WEBHOOK_PATH, json=UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+                )
+                accepted = await client.post(
+                    bot_telegram.WEBHOOK_PATH, json=UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+                )
+            await asyncio.sleep(0)
+        finally:
+            await bot.bot_stop()
+        return rejected.status_code, accepted.status_code, application.updates
+
+    rejected, accepted, updates = asyncio.run(main())
+    assert rejected == 403
+    assert accepted == 200
+    assert [update.message.text for update in updates] == ["Do you support SSO?"]
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+
+import metrics
+
+WATCHDOG_INTERVAL = float(os.getenv("WATCHDOG_INTERVAL", "0.1"))  # Seconds between event-loop probes
+WATCHDOG_BLOCK_THRESHOLD = float(os.getenv("WATCHDOG_BLOCK_THRESHOLD", "0.5"))  # Blocked seconds before stacks are dumped
+WATCHDOG_REPORT_INTERVAL = float(os.getenv("WATCHDOG_REPORT_INTERVAL", "300"))  # Seconds between health log lines
+WATCHDOG_WINDOW = 600  # Lag samples kept for percentiles, one minute at the default interval
+
+LOOP_LAG_SECONDS = metrics.Histogram(
+    "rfp_event_loop_lag_seconds", "How late the event loop ran a timer",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+EVENT_LOOP = metrics.Gauge("rfp_event_loop", "Event-loop lag, tasks, stalls and executor queue depths")
+
+
+class Watchdog:
+    """Watches the event loop from inside (timer lag) and outside (a thread that notices missed beats).
+
+    When the loop misses its beat for longer than the threshold, the thread logs the stacks of the loop
+    thread, i.e. of whatever coroutine or callback is blocking it, and of every other thread.
+    """
+
+    def __init__(self, interval=WATCHDOG_INTERVAL, threshold=WATCHDOG_BLOCK_THRESHOLD,
+                 report_interval=WATCHDOG_REPORT_INTERVAL):
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        self.stalls = 0
+        self.last_stall = None  # (blocked seconds, time.time() when it ended)
+        self.task = None
+        self.loop = None
+        self._lags = deque(maxlen=WATCHDOG_WINDOW)
+        self._executors = {}  # name -> callable returning queued work items
+        self._tasks = 0
+        self._beat = time.monotonic()
+        self._stalled_since = None
+        self._loop_thread = None
+        self._thread = None
+        self._stopping = threading.Event()
+        EVENT_LOOP.callback = self._gauges
+
+    def watch_executor(self, name, depth):
+        """Report depth(), the number of work items waiting in an executor, as part of the loop health."""
+        self._executors[name] = depth
+
+    def start(self):
+        """Start probing the running loop and the monitor thread."""
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self.task = asyncio.create_task(self._probe())
+        self._thread = threading.Thread(target=self._monitor, name="event-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        next_report = time.monotonic() + self.report_interval
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            self._beat = now
+            self._lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            self._tasks = len(asyncio.all_tasks(loop))
+
+            if self._stalled_since is not None:
+                self._stalled_since = None
+                self.last_stall = (lag, time.time())
+                logging.warning(f"Event loop was blocked for {lag:.2f}s")
+            if now >= next_report:
+                next_report = now + self.report_interval
+                logging.info(f"Watchdog: {self.summary()}")
+
+    def _monitor(self):
+        while not self._stopping.wait(self.interval / 2):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked < self.threshold or self._stalled_since is not None:
+                continue
+            self._stalled_since = self._beat
+            self.stalls += 1
+            logging.warning(f"Event loop blocked for more than {blocked:.2f}s\n{self.dump_stacks()}")
+
+    def dump_stacks(self):
+        """Return the current stack of every thread, the event-loop thread first."""
+        frames = sys._current_frames()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        order = sorted(frames, key=lambda ident: ident != self._loop_thread)
+        sections = []
+        for ident in order:
+            if ident == threading.get_ident():
+                continue
+            label = "event loop" if ident == self._loop_thread else names.get(ident, ident)
+            sections.append(f"Thread {label}:\n{''.join(traceback.format_stack(frames[ident]))}")
+        return "\n".join(sections)
+
+    def executor_depths(self):
+        # Calls waiting for asyncio's default thread pool, i.e. asyncio.to_thread
+        executor = getattr(self.loop, '_default_executor', None)
+        depths = {'threads': executor._work_queue.qsize() if executor else 0}
+        for name, depth in self._executors.items():
+            try:
+                depths[name] = depth()
+            except Exception as e:
+                logging.error(f"Executor depth of {name} failed: {e}")
+        return depths
+
+    def stats(self):
+        """Return lag percentiles over the last minute, task count, stalls and executor depths."""
+        lags = sorted(self._lags)
+
+        def percentile(fraction):
+            return lags[min(len(lags) - 1, int(len(lags) * fraction))] if lags else 0.0
+
+        return {
+            'lag_p50': percentile(0.50),
+            'lag_p99': percentile(0.99),
+            'lag_max': lags[-1] if lags else 0.0,
+            'blocked': self._stalled_since is not None,
+            'tasks': self._tasks,
+            'stalls': self.stalls,
+            'last_stall': self.last_stall,
+            'executors': self.executor_depths()
+        }
+
+    def summary(self):
+        stats = self.stats()
+        executors = ", ".join(f"{name} {depth} queued" for name, depth in stats['executors'].items())
+        return (
+            f"loop lag p50 {stats['lag_p50'] * 1000:.1f}ms, p99 {stats['lag_p99'] * 1000:.1f}ms, "
+            f"max {stats['lag_max'] * 1000:.0f}ms; {stats['tasks']} tasks; {stats['stalls']} stalls"
+            + (f"; {executors}" if executors else "")
+        )
+
+    def _gauges(self):
+        stats = self.stats()
+        values = {
+            (('kind', 'lag_p99_seconds'),): stats['lag_p99'],
+            (('kind', 'lag_max_seconds'),): stats['lag_max'],
+            (('kind', 'tasks'),): stats['tasks'],
+            (('kind', 'stalls'),): stats['stalls']
+        }
+        for name, depth in stats['executors'].items():
+            values[(('kind', 'executor_queued'), ('executor', name))] = depth
+        return values